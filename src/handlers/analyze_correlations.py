@@ -5,32 +5,52 @@ This Lambda function analyzes the aligned master dataset to discover
 correlations between market movements and celestial/geomagnetic factors.
 
 Process:
-1. Load latest_aligned.json from S3.
+1. Load latest_aligned.parquet from S3.
 2. Compute pairwise Pearson correlations.
-3. Compute lag correlations (market shifted by -1h to -24h).
+3. Compute lag correlations (environment shifted by every hour 1h to 24h).
 4. Output top correlations to S3.
 """
 
-import json
 import logging
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 import boto3
+import orjson
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common import AWS_CONFIG
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 # AWS clients
-s3_client = boto3.client('s3')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
 
 # Configuration
 PROCESSED_BUCKET = os.environ.get('PROCESSED_BUCKET', '')
 CORRELATION_THRESHOLD = 0.1  # Lowered threshold to see more potential connections
+MIN_PERIODS = 10  # Need enough overlapping data points per pair
+# A pair's variance within its overlap counts as zero below this fraction of its
+# sum of squares: the FFT-derived sums never cancel exactly on a constant window
+VARIANCE_EPS = 1e-9
+
+# One row per significant (market, environmental, lag) correlation;
+# market/other index into the column lists from extract_factors()
+CORRELATION_DTYPE = np.dtype([
+    ('market', np.int32),
+    ('other', np.int32),
+    ('lag', np.int16),
+    ('r', np.float64),
+    ('n', np.int32),
+])
 
 
 def load_aligned_data() -> pd.DataFrame:
@@ -38,13 +58,22 @@ def load_aligned_data() -> pd.DataFrame:
     try:
         obj = s3_client.get_object(
             Bucket=PROCESSED_BUCKET,
-            Key='latest_aligned.json'
+            Key='latest_aligned.parquet'
         )
-        data = json.loads(obj['Body'].read())
-        df = pd.DataFrame(data)
+        # Typed columns load straight into Arrow; no text parsing or date inference.
+        # ignore_metadata drops the writer's Arrow-backed pandas dtypes so the
+        # numeric columns come back as NumPy floats with NaN for missing values
+        table = pq.read_table(pa.BufferReader(obj['Body'].read()))
+        df = table.to_pandas(ignore_metadata=True)
         
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+        # The alignment job stores its hourly index as metadata rather than a column
+        index_meta = (table.schema.metadata or {}).get(b'chimera_index')
+        if index_meta:
+            index = orjson.loads(index_meta)
+            df.index = pd.date_range(
+                start=index['start'], periods=index['periods'], freq=index['freq'], name='timestamp'
+            )
+        elif 'timestamp' in df.columns:
             df = df.set_index('timestamp').sort_index()
         
         return df
@@ -53,115 +82,227 @@ def load_aligned_data() -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def compute_correlations(df: pd.DataFrame) -> List[Dict]:
-    """Compute pairwise Pearson correlations between all numeric columns."""
-    correlations = []
+def _center(arr: np.ndarray):
+    """
+    Return (centered values with NaNs zeroed, validity mask), both float64.
     
-    # Get numeric columns
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    The kernels accumulate in double precision: single-precision rounding in
+    the pairwise sums is as large as a genuinely small variance, so degenerate
+    pairs could not be told apart from real ones.
+    """
+    arr = arr.astype(np.float64, copy=False)
+    mask = np.isfinite(arr)
+    counts = mask.sum(axis=0)
+    means = np.where(mask, arr, 0).sum(axis=0) / np.maximum(counts, 1)
+    return np.where(mask, arr - means, 0), mask.astype(np.float64)
+
+
+def _pearson_matrix(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pearson correlation between every column of `a` and every column of `b`.
     
-    if len(numeric_cols) < 2:
-        return correlations
+    NaNs are handled by pairwise deletion: each coefficient only uses the rows
+    where both columns are present, the same as dropna() on the pair.
+    Columns are centered first (Pearson is shift-invariant) so the
+    sum-of-squares terms don't lose precision on large values.
     
-    # Separate market columns from others
-    market_cols = [c for c in numeric_cols if c.startswith('market_')]
-    other_cols = [c for c in numeric_cols if not c.startswith('market_')]
+    Returns:
+        (r, n): correlation and pairwise sample-size matrices, shape (a_cols, b_cols).
+        Undefined coefficients (constant or empty overlap) are NaN.
+    """
+    Xa, Wa = _center(a)
+    Xb, Wb = _center(b)
     
-    # Compute correlations: market vs. other factors
-    for market_col in market_cols:
-        for other_col in other_cols:
-            # Drop NaN pairs
-            valid = df[[market_col, other_col]].dropna()
-            if len(valid) < 10:  # Need enough data points
-                continue
-                
-            try:
-                r = valid[market_col].corr(valid[other_col])
-                if pd.notna(r) and abs(r) >= CORRELATION_THRESHOLD:
-                    correlations.append({
-                        'market_factor': market_col,
-                        'environmental_factor': other_col,
-                        'correlation': round(float(r), 4),
-                        'lag_hours': 0,
-                        'sample_size': int(len(valid)),
-                        'type': 'instant'
-                    })
-            except Exception:
-                continue
-    
-    return correlations
-
-
-def compute_lag_correlations(df: pd.DataFrame, max_lag: int = 24) -> List[Dict]:
+    # Sums over the rows where BOTH columns of a pair are valid
+    return _pearson_from_sums(
+        n=Wa.T @ Wb,
+        sum_a=Xa.T @ Wb,
+        sum_b=Wa.T @ Xb,
+        sum_aa=(Xa * Xa).T @ Wb,
+        sum_bb=Wa.T @ (Xb * Xb),
+        sum_ab=Xa.T @ Xb
+    )
+
+
+def _lagged_pearson(a: np.ndarray, b: np.ndarray, max_lag: int) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Compute lag correlations.
+    Pearson correlation of every column of `a` against every column of `b`
+    shifted back by each lag in 1..max_lag, via FFT cross-correlation.
     
-    Shift environmental factors back in time (lag) to see if they
-    predict future market movements.
+    Each pairwise-deletion sum is a cross-correlation of (masked) series, so
+    one rfft per column plus one irfft per product gives every lag at once.
+    
+    Returns:
+        (r, n): arrays of shape (max_lag, a_cols, b_cols); index k is lag k + 1.
+    """
+    Xa, Wa = _center(a)
+    Xb, Wb = _center(b)
+    
+    # Zero-pad past N + max_lag so the circular correlation never wraps
+    size = 1 << int(len(a) + max_lag - 1).bit_length()
+    
+    def spectrum(x: np.ndarray) -> np.ndarray:
+        # Transform along contiguous rows: one C-ordered (cols, time) row per series
+        return np.fft.rfft(np.ascontiguousarray(x.T), n=size, axis=-1)
+    
+    Fa = {'x': spectrum(Xa), 'w': spectrum(Wa), 'xx': spectrum(Xa * Xa)}
+    Fb = {'x': spectrum(Xb), 'w': spectrum(Wb), 'xx': spectrum(Xb * Xb)}
+    
+    def xcorr(fa: np.ndarray, fb: np.ndarray) -> np.ndarray:
+        # sum_t a[t] * b[t - lag] for lag = 1..max_lag -> (max_lag, a_cols, b_cols)
+        full = np.fft.irfft(fa[:, None, :] * np.conj(fb[None, :, :]), n=size, axis=-1)
+        return np.moveaxis(full[:, :, 1:max_lag + 1], -1, 0)
+    
+    return _pearson_from_sums(
+        n=np.rint(xcorr(Fa['w'], Fb['w'])),
+        sum_a=xcorr(Fa['x'], Fb['w']),
+        sum_b=xcorr(Fa['w'], Fb['x']),
+        sum_aa=xcorr(Fa['xx'], Fb['w']),
+        sum_bb=xcorr(Fa['w'], Fb['xx']),
+        sum_ab=xcorr(Fa['x'], Fb['x'])
+    )
+
+
+def _pearson_from_sums(n, sum_a, sum_b, sum_aa, sum_bb, sum_ab) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Combine pairwise sums into (r, n).
+    
+    Mirrors pandas' nancorr kernel: pairs with fewer than MIN_PERIODS
+    overlapping rows, or with zero variance, come back as NaN. Variance is
+    treated as zero below VARIANCE_EPS of the sum of squares, and rounding that
+    still pushes |r| past 1 is rejected too.
+    """
+    n, sum_a, sum_b, sum_aa, sum_bb, sum_ab = (
+        np.asarray(x, dtype=np.float64) for x in (n, sum_a, sum_b, sum_aa, sum_bb, sum_ab)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_ab - sum_a * sum_b / n
+        var_a = sum_aa - sum_a ** 2 / n
+        var_b = sum_bb - sum_b ** 2 / n
+        r = cov / np.sqrt(var_a * var_b)
+    
+    degenerate = (var_a <= VARIANCE_EPS * sum_aa) | (var_b <= VARIANCE_EPS * sum_bb)
+    r[(n < MIN_PERIODS) | degenerate | (np.abs(r) > 1 + 1e-6)] = np.nan
+    return r, n
+
+
+def _significant(r: np.ndarray) -> np.ndarray:
+    """
+    Indices of pairs with |r| above threshold.
+    
+    NaN/Inf coefficients (including pairs below MIN_PERIODS) are dropped
+    here, so every emitted value is JSON-safe.
     """
-    correlations = []
+    keep = np.isfinite(r) & (np.abs(r) >= CORRELATION_THRESHOLD)
+    return np.argwhere(keep)
+
+
+def extract_factors(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, List[str], List[str]]:
+    """
+    Split the numeric columns into market and environmental blocks once.
     
+    Returns:
+        (market, other, market_cols, other_cols): contiguous float32 arrays
+        (rows x columns) and their column names. Single precision is plenty
+        for the aligned float32 data and halves the copy; the kernels widen it.
+    """
     numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
     market_cols = [c for c in numeric_cols if c.startswith('market_')]
     other_cols = [c for c in numeric_cols if not c.startswith('market_')]
     
-    # Test lags: 1h, 2h, 4h, 6h, 12h, 24h
-    lags = [1, 2, 4, 6, 12, 24]
+    # to_numpy() is a (usually Fortran-ordered) view of the float64 block;
+    # convert dtype and layout in a single copy so BLAS/FFT get C-contiguous input
+    market = np.array(df[market_cols].to_numpy(), dtype=np.float32, order='C')
+    other = np.array(df[other_cols].to_numpy(), dtype=np.float32, order='C')
     
-    for lag in lags:
-        if lag > max_lag:
-            continue
-            
-        for market_col in market_cols:
-            for other_col in other_cols:
-                try:
-                    # Shift environmental factor BACK (so past values align with future market)
-                    shifted = df[other_col].shift(lag)
-                    valid = pd.concat([df[market_col], shifted], axis=1).dropna()
-                    
-                    if len(valid) < 10:
-                        continue
-                    
-                    r = valid.iloc[:, 0].corr(valid.iloc[:, 1])
-                    
-                    if pd.notna(r) and abs(r) >= CORRELATION_THRESHOLD:
-                        correlations.append({
-                            'market_factor': market_col,
-                            'environmental_factor': other_col,
-                            'correlation': round(float(r), 4),
-                            'lag_hours': int(lag),
-                            'sample_size': int(len(valid)),
-                            'type': 'lagged'
-                        })
-                except Exception:
-                    continue
-    
-    return correlations
+    return market, other, market_cols, other_cols
+
+
+def _to_records(r: np.ndarray, n: np.ndarray, hits: np.ndarray, lags: np.ndarray) -> np.ndarray:
+    """Pack significant (market, other) hits into a CORRELATION_DTYPE array."""
+    rec = np.empty(len(hits), dtype=CORRELATION_DTYPE)
+    rec['market'] = hits[:, -2]
+    rec['other'] = hits[:, -1]
+    rec['lag'] = lags
+    rec['r'] = np.round(r[tuple(hits.T)], 4)
+    rec['n'] = n[tuple(hits.T)]
+    return rec
+
+
+def compute_correlations(market: np.ndarray, other: np.ndarray,
+                         market_cols: List[str], other_cols: List[str]) -> np.ndarray:
+    """
+    Compute pairwise Pearson correlations between market and other factors.
+    
+    Returns:
+        np.ndarray: CORRELATION_DTYPE records (lag 0), indices into market_cols/other_cols.
+    """
+    if not market_cols or not other_cols:
+        return np.empty(0, dtype=CORRELATION_DTYPE)
+    
+    # Compute correlations: market vs. other factors (one matrix call)
+    r, n = _pearson_matrix(market, other)
+    hits = _significant(r)
+    
+    return _to_records(r, n, hits, lags=0)
+
+
+def compute_lag_correlations(market: np.ndarray, other: np.ndarray,
+                             market_cols: List[str], other_cols: List[str],
+                             max_lag: int = 24) -> np.ndarray:
+    """
+    Compute lag correlations.
+    
+    Shift environmental factors back in time (lag) to see if they
+    predict future market movements. Every hourly lag from 1 to
+    max_lag is tested.
+    
+    Returns:
+        np.ndarray: CORRELATION_DTYPE records, indices into market_cols/other_cols.
+    """
+    if not market_cols or not other_cols or max_lag < 1:
+        return np.empty(0, dtype=CORRELATION_DTYPE)
+    
+    # Shift environmental factors BACK (so past values align with future market)
+    # and scan every hourly lag 1..max_lag in one FFT pass
+    r, n = _lagged_pearson(market, other, max_lag)
+    hits = _significant(r)
+    
+    return _to_records(r, n, hits, lags=hits[:, 0] + 1)
+
+
+def to_dicts(rec: np.ndarray, market_cols: List[str], other_cols: List[str]) -> List[Dict]:
+    """Materialize correlation records as the JSON dicts served to the dashboard."""
+    return [
+        {
+            'market_factor': market_cols[m],
+            'environmental_factor': other_cols[o],
+            'correlation': r,
+            'lag_hours': lag,
+            'sample_size': n,
+            'type': 'instant' if lag == 0 else 'lagged'
+        }
+        for m, o, lag, r, n in zip(
+            rec['market'].tolist(), rec['other'].tolist(), rec['lag'].tolist(),
+            rec['r'].tolist(), rec['n'].tolist()
+        )
+    ]
 
 
 # Blacklist specific patterns (e.g., ID columns, spurious counters)
 BLACKLIST_PATTERNS = ['region', '_id', 'station', 'obsid', 'quality', 'report_status']
+_BLACKLIST_RE = re.compile('|'.join(map(re.escape, BLACKLIST_PATTERNS)), re.IGNORECASE)
 
 def is_blacklisted(col_name: str) -> bool:
     """Check if column name contains any blacklisted patterns."""
-    return any(p in col_name.lower() for p in BLACKLIST_PATTERNS)
+    return _BLACKLIST_RE.search(col_name) is not None
+
+# Common OHLCV suffixes collapsed when building the diverse top list
+_FACTOR_SUFFIX_RE = re.compile(r'_(open|close|high|low|volume)$')
 
 def get_factor_base(name: str) -> str:
     """Extract base factor name (e.g., 'market_spy_close' -> 'market_spy')."""
-    # Remove common suffixes
-    clean = name.replace('_open', '').replace('_close', '').replace('_high', '').replace('_low', '').replace('_volume', '')
-    return clean
-
-def clean_float(obj):
-    """Recursively replace NaN/Inf with None (null) for JSON safety."""
-    if isinstance(obj, dict):
-        return {k: clean_float(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_float(v) for v in obj]
-    elif isinstance(obj, float):
-        if np.isnan(obj) or np.isinf(obj):
-            return None
-    return obj
+    return _FACTOR_SUFFIX_RE.sub('', name)
 
 def analyze() -> Dict:
     """Main analysis logic."""
@@ -181,28 +322,32 @@ def analyze() -> Dict:
     
     logger.info(f"Loaded data shape: {df.shape}")
     
+    # Extract numeric blocks once, shared by instant + lag analysis
+    market, other, market_cols, other_cols = extract_factors(df)
+    
     # Compute correlations
-    instant_corr = compute_correlations(df)
-    lag_corr = compute_lag_correlations(df)
+    instant_corr = compute_correlations(market, other, market_cols, other_cols)
+    lag_corr = compute_lag_correlations(market, other, market_cols, other_cols)
+    
+    records = np.concatenate([instant_corr, lag_corr])
     
-    all_correlations = instant_corr + lag_corr
+    # Sort by absolute correlation (strongest first); stable, so ties keep instant-then-lag order
+    records = records[np.argsort(-np.abs(records['r']), kind='stable')]
+    all_correlations = to_dicts(records, market_cols, other_cols)
     
-    # Sort by absolute correlation (strongest first)
-    all_correlations.sort(key=lambda x: abs(x['correlation']), reverse=True)
+    # Create diverse top list: one entry per (Market, Env) base pair,
+    # e.g. "market_spy" + "schumann_amplitude". Bases are derived once per column.
+    market_bases = [get_factor_base(c) for c in market_cols]
+    other_bases = [get_factor_base(c) for c in other_cols]
     
-    # Create diverse top list
     seen_pairs = set()
     top_correlations = []
     
-    for c in all_correlations:
-        # Create a unique key for the (Market, Env) pair
-        # e.g. "market_spy" + "schumann_amplitude"
-        market_base = get_factor_base(c['market_factor'])
-        env_base = get_factor_base(c['environmental_factor'])
-        pair_key = f"{market_base}::{env_base}"
+    for pos, (m, o) in enumerate(zip(records['market'].tolist(), records['other'].tolist())):
+        pair_key = (market_bases[m], other_bases[o])
         
         if pair_key not in seen_pairs:
-            top_correlations.append(c)
+            top_correlations.append(all_correlations[pos])
             seen_pairs.add(pair_key)
             
         if len(top_correlations) >= 50:
@@ -219,26 +364,24 @@ def analyze() -> Dict:
         'all_correlations': all_correlations  # Full raw list
     }
     
-    # Final safety pass for JSON compliance (replaces NaN with null)
-    result = clean_float(result)
-    
-    # Save to S3
+    # Save to S3 (serialized once, compact, reused for both keys)
     output_key = f"correlations_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    payload = orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY)
     
-    s3_client.put_object(
-        Bucket=PROCESSED_BUCKET,
-        Key=output_key,
-        Body=json.dumps(result, indent=2),
-        ContentType='application/json'
-    )
-    
-    # Also save as 'latest'
-    s3_client.put_object(
-        Bucket=PROCESSED_BUCKET,
-        Key='latest_correlations.json',
-        Body=json.dumps(result, indent=2),
-        ContentType='application/json'
-    )
+    # Write the timestamped copy and 'latest' concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        uploads = [
+            executor.submit(
+                s3_client.put_object,
+                Bucket=PROCESSED_BUCKET,
+                Key=key,
+                Body=payload,
+                ContentType='application/json'
+            )
+            for key in (output_key, 'latest_correlations.json')
+        ]
+        for upload in uploads:
+            upload.result()
     
     logger.info(f"Analysis complete. Found {len(all_correlations)} correlations above threshold.")
     
@@ -0,0 +1,66 @@
+"""
+Chimera Shared Handler Helpers
+
+Every function is deployed from src/handlers/ (CodeUri), so the handlers
+import this module directly.
+"""
+
+import logging
+from contextlib import nullcontext
+
+from botocore.config import Config
+
+logger = logging.getLogger()
+
+# botocore settings for every handler's clients: reuse sockets across warm
+# invocations and allow enough pooled connections for concurrent calls
+AWS_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    max_pool_connections=50,
+)
+
+
+def metadata_writer(table):
+    """
+    Open a batched writer on the metadata table.
+    
+    Writes are buffered and sent 25 items per BatchWriteItem call. Yields
+    None when the table is not configured.
+    
+    Args:
+        table: Metadata Table resource, or None if METADATA_TABLE is unset
+    """
+    if table is None:
+        return nullcontext()
+    return table.batch_writer(overwrite_by_pkeys=['source_id', 'timestamp'])
+
+
+def register_entities(table, source_type: str, entity_ids, record_count: int = 0) -> None:
+    """
+    Add entity ids (e.g. 'market_SPY') to the per-source registry item and
+    count the metadata records written for them.
+    
+    The dashboard reads this item to look up the latest record of each
+    entity directly, and to report the record count, instead of reading
+    the source's whole history.
+    
+    Args:
+        table: Metadata Table resource, or None if METADATA_TABLE is unset
+        source_type: Source type the entities belong to
+        entity_ids: source_id values that have metadata records
+        record_count: Metadata records written by this invocation
+    """
+    if table is None or not entity_ids:
+        return
+    
+    try:
+        # ADD is atomic, so overlapping invocations never lose each other's counts
+        table.update_item(
+            Key={'source_id': f'source_type#{source_type}', 'timestamp': 'entities'},
+            UpdateExpression='ADD entity_ids :ids, record_count :n',
+            ExpressionAttributeValues={':ids': set(entity_ids), ':n': record_count},
+        )
+    except Exception as e:
+        # Non-fatal: the dashboard falls back to querying the source_type index
+        logger.error(f"Error registering entities for {source_type}: {str(e)}", exc_info=True)
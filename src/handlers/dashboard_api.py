@@ -8,27 +8,62 @@ This Lambda function provides REST API endpoints for the Chimera dashboard:
 - POST /ingest/{source} - Trigger ingestion for a source
 """
 
+import base64
+import gzip
 import json
 import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any
+from functools import lru_cache
+from typing import Any, Tuple
 
 import boto3
-from boto3.dynamodb.conditions import Key, Attr
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Key
+
+from common import AWS_CONFIG
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-lambda_client = boto3.client('lambda')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=AWS_CONFIG)
+
+# Shared pool for concurrent AWS calls; lives as long as the warm container
+executor = ThreadPoolExecutor(max_workers=16)
+
+
+@lru_cache(maxsize=None)
+def get_lambda_client():
+    """Lambda client, created on first use (most requests never invoke Lambda)."""
+    return boto3.client('lambda', config=AWS_CONFIG)
+
 
 # Configuration
 RAW_BUCKET = os.environ.get('RAW_BUCKET', '')
 METADATA_TABLE = os.environ.get('METADATA_TABLE', '')
+SOURCE_TYPE_INDEX = 'by_source_type'  # GSI: source_type (HASH) + ingestion_time (RANGE)
+STATUS_CACHE_TTL = float(os.environ.get('STATUS_CACHE_TTL', '15'))  # seconds; the dashboard polls these
+
+COMPRESS_MIN_BYTES = 1024  # smaller bodies are sent uncompressed
+LAMBDA_CHECK_TTL = 300  # seconds; deployed functions don't change between invocations
+# Rollups older than this fall back to per-entity reads: daily ingests plus slack
+ROLLUP_MAX_AGE = timedelta(hours=float(os.environ.get('ROLLUP_MAX_AGE_HOURS', '26')))
+
+# Recent GET responses keyed by path, reused across warm invocations of this container
+_response_cache = {}
+
+# Last successful Lambda health check, as (monotonic time, result)
+_lambda_check_cache = {}
 
 # Data source configuration
 DATA_SOURCES = {
@@ -63,6 +98,14 @@ DATA_SOURCES = {
         'description': 'Yahoo Finance'
     }
 }
+_DATA_SOURCE_ITEMS = tuple(DATA_SOURCES.items())
+
+# Deployment suffix (e.g. 'dev' from 'chimera-dashboard-dev') and the function names derived from it
+ENV_SUFFIX = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'dev').split('-')[-1]
+INGEST_FUNCTIONS = {source: f"{info['lambda']}-{ENV_SUFFIX}" for source, info in DATA_SOURCES.items()}
+ALIGNMENT_FUNCTION = f"chimera-alignment-{ENV_SUFFIX}"
+CORRELATION_FUNCTION = f"chimera-correlation-{ENV_SUFFIX}"
+EXPECTED_FUNCTIONS = (*INGEST_FUNCTIONS.values(), ALIGNMENT_FUNCTION, CORRELATION_FUNCTION)
 
 
 def response(status_code: int, body: Any) -> dict:
@@ -75,49 +118,106 @@ def response(status_code: int, body: Any) -> dict:
             'Access-Control-Allow-Headers': 'Content-Type,Authorization',
             'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
         },
-        'body': json.dumps(body, default=str)
+        'body': orjson.dumps(body, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
     }
 
 
+def compress_response(resp: dict, event: dict) -> dict:
+    """
+    Gzip a response body if the client accepts it and it is worth compressing.
+    
+    Returns a new dict; `resp` may be a cached response shared across requests.
+    """
+    headers = event.get('headers') or {}
+    accept = next((v for k, v in headers.items() if k.lower() == 'accept-encoding'), '') or ''
+    if 'gzip' not in accept or len(resp['body']) < COMPRESS_MIN_BYTES:
+        return resp
+    
+    return {
+        **resp,
+        'headers': {**resp['headers'], 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+        'body': base64.b64encode(gzip.compress(resp['body'].encode(), compresslevel=1)).decode(),
+        'isBase64Encoded': True
+    }
+
+
+def get_cached_response(key: str):
+    """Return a cached response for `key` if it is younger than STATUS_CACHE_TTL."""
+    hit = _response_cache.get(key)
+    if hit and time.monotonic() - hit[0] < STATUS_CACHE_TTL:
+        return hit[1]
+    return None
+
+
+def cache_response(key: str, resp: dict) -> dict:
+    """Remember a successful response for `key` and pass it through."""
+    if resp['statusCode'] == 200:
+        _response_cache[key] = (time.monotonic(), resp)
+    return resp
+
+
 def get_source_status(source_prefix: str) -> dict:
-    """Get the latest ingestion status for a source prefix (e.g., 'planetary' matches 'planetary_Sun', 'planetary_Moon')."""
+    """Get the latest ingestion status for a source type (e.g., 'planetary' covers 'planetary_Sun', 'planetary_Moon')."""
     if not METADATA_TABLE:
         return {'status': 'unknown', 'message': 'Metadata table not configured'}
     
     table = dynamodb.Table(METADATA_TABLE)
     
-    # Scan for records that begin with this source prefix
-    result = table.scan(
-        FilterExpression=Attr('source_id').begins_with(f"{source_prefix}_")
+    # Latest record for this source type is the first item of the index, newest first
+    result = table.query(
+        IndexName=SOURCE_TYPE_INDEX,
+        KeyConditionExpression=Key('source_type').eq(source_prefix),
+        ScanIndexForward=False,
+        Limit=1,
+        ProjectionExpression='#s, #t, ingestion_time, s3_key, processed_key',
+        ExpressionAttributeNames={'#s': 'status', '#t': 'timestamp'}
     )
     
     items = result.get('Items', [])
     
     if items:
-        # Sort by ingestion_time descending and get the most recent
-        items_sorted = sorted(items, key=lambda x: x.get('ingestion_time', ''), reverse=True)
-        latest = items_sorted[0]
+        latest = items[0]
         
         return {
             'status': latest.get('status', 'unknown'),
             'last_timestamp': latest.get('timestamp'),
             'last_ingestion': latest.get('ingestion_time'),
             's3_key': latest.get('s3_key') or latest.get('processed_key', ''),
-            'record_count': len(items)  # Count of all records for this source type
+            'record_count': get_record_count(table, source_prefix)  # Count of all records for this source type
         }
     
     return {'status': 'no_data', 'message': 'No ingestion records found'}
 
 
+def get_record_count(table, source_prefix: str):
+    """
+    Metadata record count kept on the source's registry item by the ingesters.
+    
+    A single GetItem instead of counting the whole source_type partition, whose
+    cost grows with the table. Records written before the counter existed are
+    not included; None if the source has never updated it.
+    """
+    registry = table.get_item(
+        Key={'source_id': f'source_type#{source_prefix}', 'timestamp': 'entities'},
+        ProjectionExpression='record_count'
+    ).get('Item') or {}
+    count = registry.get('record_count')
+    return int(count) if count is not None else None
+
+
 def handle_status(event: dict) -> dict:
     """Handle GET /status - return status of all data sources."""
     logger.info("Handling /status request")
     
+    cached = get_cached_response('/status')
+    if cached:
+        return cached
+    
+    # Look up every source concurrently (one DynamoDB round trip each)
+    statuses = list(executor.map(get_source_status, (key for key, _ in _DATA_SOURCE_ITEMS)))
+    
     sources = []
-    for source_key, source_info in DATA_SOURCES.items():
-        # Get status using prefix matching (e.g., 'planetary' finds 'planetary_Sun', etc.)
-        status = get_source_status(source_key)
-        
+    for (source_key, source_info), status in zip(_DATA_SOURCE_ITEMS, statuses):
         sources.append({
             'id': source_key,
             'name': source_info['name'],
@@ -126,11 +226,56 @@ def handle_status(event: dict) -> dict:
             **status
         })
     
-    return response(200, {
+    return cache_response('/status', response(200, {
         'timestamp': datetime.utcnow().isoformat(),
         'sources': sources,
-        'environment': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local').split('-')[-1]
-    })
+        'environment': ENV_SUFFIX
+    }))
+
+
+def check_s3_raw_bucket() -> dict:
+    """Health check: raw bucket is reachable."""
+    s3_client.head_bucket(Bucket=RAW_BUCKET)
+    return {'status': 'ok', 'bucket': RAW_BUCKET}
+
+
+def check_dynamodb_metadata() -> dict:
+    """Health check: metadata table exists."""
+    table = dynamodb.Table(METADATA_TABLE)
+    table.table_status
+    return {'status': 'ok', 'table': METADATA_TABLE}
+
+
+def check_lambda_functions() -> dict:
+    """Health check: Chimera Lambda functions are deployed."""
+    cached = _lambda_check_cache.get('result')
+    if cached and time.monotonic() - cached[0] < LAMBDA_CHECK_TTL:
+        return cached[1]
+    
+    # Targeted lookups instead of paging through list_functions; a missing
+    # function raises ResourceNotFoundException and marks the check failed.
+    # This check itself runs on the shared executor, so its lookups get their
+    # own pool: waiting on tasks queued to the same pool could deadlock it
+    lambda_client = get_lambda_client()
+    with ThreadPoolExecutor(max_workers=len(EXPECTED_FUNCTIONS)) as pool:
+        chimera_funcs = list(pool.map(
+            lambda name: lambda_client.get_function_configuration(FunctionName=name)['FunctionName'],
+            EXPECTED_FUNCTIONS
+        ))
+    result = {
+        'status': 'ok', 
+        'count': len(chimera_funcs),
+        'functions': chimera_funcs
+    }
+    _lambda_check_cache['result'] = (time.monotonic(), result)
+    return result
+
+
+HEALTH_CHECKS = {
+    's3_raw_bucket': check_s3_raw_bucket,
+    'dynamodb_metadata': check_dynamodb_metadata,
+    'lambda_functions': check_lambda_functions,
+}
 
 
 def handle_health(event: dict) -> dict:
@@ -143,36 +288,15 @@ def handle_health(event: dict) -> dict:
         'checks': {}
     }
     
-    # Check S3 bucket
-    try:
-        s3_client.head_bucket(Bucket=RAW_BUCKET)
-        health['checks']['s3_raw_bucket'] = {'status': 'ok', 'bucket': RAW_BUCKET}
-    except Exception as e:
-        health['status'] = 'degraded'
-        health['checks']['s3_raw_bucket'] = {'status': 'error', 'error': str(e)}
+    # The checks hit unrelated services, so run them concurrently
+    futures = {name: executor.submit(check) for name, check in HEALTH_CHECKS.items()}
     
-    # Check DynamoDB table
-    try:
-        table = dynamodb.Table(METADATA_TABLE)
-        table.table_status
-        health['checks']['dynamodb_metadata'] = {'status': 'ok', 'table': METADATA_TABLE}
-    except Exception as e:
-        health['status'] = 'degraded'
-        health['checks']['dynamodb_metadata'] = {'status': 'error', 'error': str(e)}
-    
-    # Check Lambda functions exist
-    try:
-        funcs = lambda_client.list_functions(MaxItems=20)
-        chimera_funcs = [f['FunctionName'] for f in funcs['Functions'] 
-                         if f['FunctionName'].startswith('chimera-')]
-        health['checks']['lambda_functions'] = {
-            'status': 'ok', 
-            'count': len(chimera_funcs),
-            'functions': chimera_funcs
-        }
-    except Exception as e:
-        health['status'] = 'degraded'
-        health['checks']['lambda_functions'] = {'status': 'error', 'error': str(e)}
+    for name, future in futures.items():
+        try:
+            health['checks'][name] = future.result()
+        except Exception as e:
+            health['status'] = 'degraded'
+            health['checks'][name] = {'status': 'error', 'error': str(e)}
     
     status_code = 200 if health['status'] == 'healthy' else 503
     return response(status_code, health)
@@ -185,27 +309,93 @@ def get_all_source_keys(source_prefix: str) -> list:
     
     table = dynamodb.Table(METADATA_TABLE)
     
-    # Scan for all records with this prefix
-    result = table.scan(
-        FilterExpression=Attr('source_id').begins_with(f"{source_prefix}_")
-    )
+    # Ingesters register their entity ids on a per-source item; with it, each
+    # entity's latest record is a single Limit=1 query instead of a full history read
+    registry = table.get_item(
+        Key={'source_id': f'source_type#{source_prefix}', 'timestamp': 'entities'},
+        ProjectionExpression='entity_ids'
+    ).get('Item')
+    
+    if registry and registry.get('entity_ids'):
+        def latest_for_entity(entity_id: str):
+            result = table.query(
+                KeyConditionExpression=Key('source_id').eq(entity_id),
+                ScanIndexForward=False,
+                Limit=1,
+                ProjectionExpression='source_id, s3_key, processed_key'
+            )
+            items = result.get('Items', [])
+            return items[0] if items else None
+        
+        latest = executor.map(latest_for_entity, sorted(registry['entity_ids']))
+        return [item for item in latest if item]
+    
+    kwargs = {
+        'IndexName': SOURCE_TYPE_INDEX,
+        'KeyConditionExpression': Key('source_type').eq(source_prefix),
+        'ScanIndexForward': False,
+        'ProjectionExpression': 'source_id, s3_key, processed_key'
+    }
     
-    items = result.get('Items', [])
-    if not items:
-        return []
-
-    # Group by source_id (e.g. planetary_Sun, planetary_Mars) and pick the latest for each
+    # Items arrive newest first, so the first record seen for each
+    # source_id (e.g. planetary_Sun, planetary_Mars) is its latest
     latest_by_entity = {}
-    for item in items:
-        entity = item['source_id']
-        timestamp = item.get('ingestion_time', '')
+    while True:
+        result = table.query(**kwargs)
+        for item in result.get('Items', []):
+            latest_by_entity.setdefault(item['source_id'], item)
         
-        if entity not in latest_by_entity or timestamp > latest_by_entity[entity]['ingestion_time']:
-            latest_by_entity[entity] = item
+        if 'LastEvaluatedKey' not in result:
+            break
+        kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
             
     return list(latest_by_entity.values())
 
 
+def decode_object(obj: dict, s3_key: str) -> Tuple[Any, int]:
+    """
+    Decode an ingested S3 object: Parquet tables become records, JSON may be gzip-encoded.
+    
+    Returns:
+        (data, size): the decoded data and the bytes of JSON it adds to the
+        response, which is several times the stored (compressed) size.
+    """
+    body = obj['Body'].read()
+    if s3_key.endswith('.parquet'):
+        records = pq.read_table(pa.BufferReader(body)).to_pylist()
+        return records, len(orjson.dumps(records, default=str))
+    if obj.get('ContentEncoding') == 'gzip':
+        body = gzip.decompress(body)
+    return orjson.loads(body), len(body)
+
+
+def get_rollup(source: str, max_size: int):
+    """
+    Return the rollup at {source}/latest.json, or None if absent, too large or stale.
+    
+    The rollup is {'ingested_at': {entity: time}, 'data': {entity: data}}. It is
+    stale once any entity is older than ROLLUP_MAX_AGE (e.g. its ingests keep
+    failing), or if it predates per-entity timestamps; the caller then reads
+    each entity's latest record instead.
+    """
+    try:
+        obj = s3_client.get_object(Bucket=RAW_BUCKET, Key=f"{source}/latest.json")
+    except ClientError:
+        return None
+    
+    if obj['ContentLength'] > max_size:
+        obj['Body'].close()
+        return None
+    
+    rollup = orjson.loads(obj['Body'].read())
+    ingested_at = rollup.get('ingested_at') if isinstance(rollup, dict) else None
+    if not ingested_at or 'data' not in rollup:
+        return None
+    if min(ingested_at.values()) < (datetime.utcnow() - ROLLUP_MAX_AGE).isoformat():
+        return None
+    return rollup
+
+
 def handle_data(event: dict, source: str) -> dict:
     """Handle GET /data/{source} - return latest aggregated data for a source."""
     logger.info(f"Handling /data/{source} request")
@@ -213,40 +403,58 @@ def handle_data(event: dict, source: str) -> dict:
     if source not in DATA_SOURCES:
         return response(404, {'error': f'Unknown source: {source}'})
     
+    MAX_SIZE = 5 * 1024 * 1024  # 5MB safety limit
+    
+    # Ingesters that maintain a rollup of all entities let us answer with one GET
+    rollup = get_rollup(source, MAX_SIZE)
+    if rollup is not None:
+        return response(200, {
+            'source': source,
+            'timestamp': datetime.utcnow().isoformat(),
+            'entities': list(rollup['data'].keys()),
+            'ingested_at': rollup['ingested_at'],
+            'data': rollup['data']
+        })
+    
     # Get latest items for all sub-entities
     latest_items = get_all_source_keys(source)
     
     if not latest_items:
         return response(404, {'error': f'No data found for source: {source}'})
     
-    aggregated_data = {}
     total_size = 0
-    MAX_SIZE = 5 * 1024 * 1024  # 5MB safety limit
+    size_lock = threading.Lock()
     
-    # fetch data for each entity
-    for item in latest_items:
+    def fetch_entity(item: dict):
+        nonlocal total_size
         s3_key = item.get('s3_key') or item.get('processed_key')
         if not s3_key:
-            continue
+            return None
             
         try:
             entity_name = item['source_id'].replace(f"{source}_", "")
             
             obj = s3_client.get_object(Bucket=RAW_BUCKET, Key=s3_key)
-            content = obj['Body'].read().decode('utf-8')
+            data, size = decode_object(obj, s3_key)
             
-            # Check size before parsing/adding
-            if total_size + len(content) > MAX_SIZE:
-                 aggregated_data[entity_name] = {'message': 'Data truncated (payload too large)', 's3_key': s3_key}
-                 continue
-
-            data = json.loads(content)
-            aggregated_data[entity_name] = data
-            total_size += len(content)
+            # Reserve against the decoded size: that is what counts toward the response limit
+            with size_lock:
+                fits = total_size + size <= MAX_SIZE
+                if fits:
+                    total_size += size
+            if not fits:
+                return entity_name, {'message': 'Data truncated (payload too large)', 's3_key': s3_key}
+
+            return entity_name, data
             
         except Exception as e:
             logger.error(f"Error fetching {s3_key}: {e}")
-            continue
+            return None
+    
+    # fetch data for all entities concurrently
+    aggregated_data = dict(
+        result for result in executor.map(fetch_entity, latest_items) if result
+    )
 
     return response(200, {
         'source': source,
@@ -260,14 +468,15 @@ def handle_process(event: dict) -> dict:
     """Handle POST /process - trigger data alignment."""
     logger.info("Handling /process request")
     
-    env = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'dev').split('-')[-1]
-    function_name = f"chimera-alignment-{env}"
+    function_name = ALIGNMENT_FUNCTION
+    
+    lambda_client = get_lambda_client()
     
     try:
         result = lambda_client.invoke(
             FunctionName=function_name,
             InvocationType='Event',  # Async
-            Payload=json.dumps({})
+            Payload=b'{}'
         )
         
         return response(202, {
@@ -288,18 +497,21 @@ def handle_processed_status(event: dict) -> dict:
     if not PROCESSED_BUCKET:
         # Try to guess or fail
         return response(500, {'error': 'PROCESSED_BUCKET not defined'})
-        
+    
     try:
-        resp = s3_client.list_objects_v2(Bucket=PROCESSED_BUCKET, Prefix='master_aligned_', MaxKeys=1)
-        if 'Contents' not in resp:
-            return response(404, {'message': 'No aligned data found'})
-            
-        latest = resp['Contents'][0]
+        # The alignment job tags its fixed 'latest' copy with the timestamped key,
+        # so a HEAD replaces listing the prefix. Not cached: the dashboard polls this
+        # seconds after POST /process and must see the new file as soon as it lands
+        latest = s3_client.head_object(Bucket=PROCESSED_BUCKET, Key='latest_aligned.parquet')
         return response(200, {
-            'latest_file': latest['Key'],
+            'latest_file': latest['Metadata'].get('source_key', 'latest_aligned.parquet'),
             'last_modified': latest['LastModified'].isoformat(),
-            'size': latest['Size']
+            'size': latest['ContentLength']
         })
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return response(404, {'message': 'No aligned data found'})
+        return response(500, {'error': str(e)})
     except Exception as e:
         return response(500, {'error': str(e)})
 
@@ -308,14 +520,15 @@ def handle_analyze(event: dict) -> dict:
     """Handle POST /analyze - trigger correlation analysis."""
     logger.info("Handling /analyze request")
     
-    env = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'dev').split('-')[-1]
-    function_name = f"chimera-correlation-{env}"
+    function_name = CORRELATION_FUNCTION
+    
+    lambda_client = get_lambda_client()
     
     try:
         result = lambda_client.invoke(
             FunctionName=function_name,
             InvocationType='Event',  # Async
-            Payload=json.dumps({})
+            Payload=b'{}'
         )
         
         return response(202, {
@@ -334,6 +547,10 @@ def handle_correlations(event: dict) -> dict:
     PROCESSED_BUCKET = os.environ.get('PROCESSED_BUCKET', '')
     if not PROCESSED_BUCKET:
         return response(500, {'error': 'PROCESSED_BUCKET not defined'})
+    
+    cached = get_cached_response('/correlations')
+    if cached:
+        return cached
         
     try:
         # Generate presigned URL to bypass 6MB limit
@@ -342,14 +559,14 @@ def handle_correlations(event: dict) -> dict:
             Params={'Bucket': PROCESSED_BUCKET, 'Key': 'latest_correlations.json'},
             ExpiresIn=3600
         )
-        return response(200, {'url': url})
+        return cache_response('/correlations', response(200, {'url': url}))
     except Exception as e:
         logger.error(f"Error generating presigned URL: {e}")
         # Fallback to direct fetch if small (though usually it's large)
         try:
             obj = s3_client.get_object(Bucket=PROCESSED_BUCKET, Key='latest_correlations.json')
-            data = json.loads(obj['Body'].read().decode('utf-8'))
-            return response(200, data)
+            data = orjson.loads(obj['Body'].read())
+            return cache_response('/correlations', response(200, data))
         except s3_client.exceptions.NoSuchKey:
             return response(404, {'message': 'No correlations found. Run analysis first.'})
         except Exception as e2:
@@ -363,23 +580,26 @@ def handle_ingest(event: dict, source: str) -> dict:
     if source not in DATA_SOURCES:
         return response(404, {'error': f'Unknown source: {source}'})
     
-    source_info = DATA_SOURCES[source]
-    env = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'dev').split('-')[-1]
-    function_name = f"{source_info['lambda']}-{env}"
+    function_name = INGEST_FUNCTIONS[source]
+    
+    lambda_client = get_lambda_client()
     
     try:
         # Parse request body for event payload
         body = {}
         if event.get('body'):
-            body = json.loads(event['body'])
+            body = orjson.loads(event['body'])
         
         # Invoke the ingestion Lambda
         result = lambda_client.invoke(
             FunctionName=function_name,
             InvocationType='Event',  # Async invocation
-            Payload=json.dumps(body)
+            Payload=orjson.dumps(body)
         )
         
+        # Don't keep serving the pre-trigger /status to the dashboard's next refresh
+        _response_cache.pop('/status', None)
+        
         return response(202, {
             'message': f'Ingestion triggered for {source}',
             'function': function_name,
@@ -393,40 +613,52 @@ def handle_ingest(event: dict, source: str) -> dict:
         return response(500, {'error': str(e)})
 
 
+# Routing tables: path -> (required method or None for any, handler)
+EXACT_ROUTES = {
+    '/status': (None, handle_status),
+    '/health': (None, handle_health),
+    '/process': ('POST', handle_process),
+    '/processed': (None, handle_processed_status),
+    '/analyze': ('POST', handle_analyze),
+    '/correlations': (None, handle_correlations),
+}
+
+# Parameterized /{kind}/{source} paths
+SOURCE_ROUTES = {
+    'data': (None, handle_data),
+    'ingest': ('POST', handle_ingest),
+}
+SOURCE_PATH_RE = re.compile(r'^/(data|ingest)/')
+
+
 def lambda_handler(event: dict, context: Any) -> dict:
     """AWS Lambda handler for Dashboard API."""
-    logger.info(f"Dashboard API request: {json.dumps(event)}")
+    logger.info(f"Dashboard API request: {event.get('httpMethod')} {event.get('path')}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Event: {json.dumps(event)}")
+    
+    # With binary media types enabled, API Gateway base64-encodes request bodies
+    if event.get('isBase64Encoded') and event.get('body'):
+        event = {**event, 'body': base64.b64decode(event['body']).decode('utf-8')}
     
+    return compress_response(route_request(event), event)
+
+
+def route_request(event: dict) -> dict:
+    """Dispatch a request to its handler."""
     http_method = event.get('httpMethod', 'GET')
     path = event.get('path', '/')
     path_params = event.get('pathParameters') or {}
     
-    # Route request
-    if path == '/status':
-        return handle_status(event)
-    
-    elif path == '/health':
-        return handle_health(event)
-
-    elif path == '/process' and http_method == 'POST':
-        return handle_process(event)
-    
-    elif path == '/processed':
-        return handle_processed_status(event)
-    
-    elif path.startswith('/data/'):
-        source = path_params.get('source', path.split('/')[-1])
-        return handle_data(event, source)
-    
-    elif path.startswith('/ingest/') and http_method == 'POST':
-        source = path_params.get('source', path.split('/')[-1])
-        return handle_ingest(event, source)
-    
-    elif path == '/analyze' and http_method == 'POST':
-        return handle_analyze(event)
+    route = EXACT_ROUTES.get(path)
+    if route and route[0] in (None, http_method):
+        return route[1](event)
     
-    elif path == '/correlations':
-        return handle_correlations(event)
+    match = SOURCE_PATH_RE.match(path)
+    if match:
+        method, handler = SOURCE_ROUTES[match.group(1)]
+        if method in (None, http_method):
+            source = path_params.get('source', path.split('/')[-1])
+            return handler(event, source)
     
-    else:
-        return response(404, {'error': 'Not found', 'path': path})
+    return response(404, {'error': 'Not found', 'path': path})
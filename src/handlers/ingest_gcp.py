@@ -12,30 +12,38 @@ Data Sources:
 - Live Data Display: https://gcp2.net/#home_page_live_data
 """
 
+import gzip
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Any
 
 import boto3
+import orjson
 import pandas as pd
+import pyarrow.csv as pacsv
+
+from common import AWS_CONFIG, metadata_writer, register_entities
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=AWS_CONFIG)
 
 # Configuration
 RAW_BUCKET = os.environ.get('RAW_BUCKET', '')
 METADATA_TABLE = os.environ.get('METADATA_TABLE', '')
+metadata_table = dynamodb.Table(METADATA_TABLE) if METADATA_TABLE else None
 
 # Expected input format for manually uploaded files
 UPLOAD_PREFIX = 'gcp/uploads/'
 PROCESSED_PREFIX = 'gcp/processed/'
+MAX_WORKERS = 4  # files processed concurrently
 
 
 def list_pending_files() -> list:
@@ -47,27 +55,28 @@ def list_pending_files() -> list:
     """
     logger.info(f"Scanning for pending files in s3://{RAW_BUCKET}/{UPLOAD_PREFIX}")
     
-    response = s3_client.list_objects_v2(
-        Bucket=RAW_BUCKET,
-        Prefix=UPLOAD_PREFIX,
-    )
+    # A single list call stops at 1000 keys; page through the whole prefix
+    paginator = s3_client.get_paginator('list_objects_v2')
+    pages = paginator.paginate(Bucket=RAW_BUCKET, Prefix=UPLOAD_PREFIX)
     
-    files = []
-    for obj in response.get('Contents', []):
-        key = obj['Key']
-        if key.endswith('.csv') or key.endswith('.json') or key.endswith('.txt'):
-            files.append(key)
+    files = [
+        obj['Key']
+        for page in pages
+        for obj in page.get('Contents', [])
+        if obj['Key'].endswith(('.csv', '.json', '.txt'))
+    ]
     
     logger.info(f"Found {len(files)} pending files")
     return files
 
 
-def process_gcp_file(s3_key: str) -> dict:
+def process_gcp_file(s3_key: str, ingestion_time: str) -> dict:
     """
     Process a single GCP data file.
     
     Args:
         s3_key: S3 key of the file to process
+        ingestion_time: ISO timestamp shared by everything written this invocation
     
     Returns:
         dict: Processing results
@@ -76,32 +85,46 @@ def process_gcp_file(s3_key: str) -> dict:
     
     # Download file
     response = s3_client.get_object(Bucket=RAW_BUCKET, Key=s3_key)
-    content = response['Body'].read()
     
-    # Determine file type and parse
+    body = None
+    
+    # Determine file type and parse; the tabular formats read the S3 stream directly
     if s3_key.endswith('.csv'):
-        df = pd.read_csv(pd.io.common.BytesIO(content))
+        # Arrow's multithreaded C++ parser, converted straight to pandas
+        df = pacsv.read_csv(response['Body']).to_pandas()
     elif s3_key.endswith('.json'):
-        data = json.loads(content.decode('utf-8'))
-        df = pd.DataFrame(data)
+        content = response['Body'].read()
+        data = orjson.loads(content)
+        if isinstance(data, list) and all(isinstance(record, dict) for record in data):
+            # Already a list of records: store the uploaded bytes as-is
+            body = content
+            record_count = len(data)
+            columns = list(dict.fromkeys(k for record in data for k in record))
+        else:
+            df = pd.DataFrame(data)
     elif s3_key.endswith('.txt'):
-        # Attempt to parse as whitespace-delimited
-        df = pd.read_csv(pd.io.common.BytesIO(content), delim_whitespace=True)
+        # Attempt to parse as whitespace-delimited (Arrow can't collapse runs of spaces)
+        df = pd.read_csv(response['Body'], sep=r'\s+')
     else:
         raise ValueError(f"Unsupported file format: {s3_key}")
     
-    logger.info(f"Loaded {len(df)} records from file")
-    logger.debug(f"Columns: {df.columns.tolist()}")
+    if body is None:
+        body = df.to_json(orient='records', date_format='iso')
+        record_count = len(df)
+        columns = df.columns.tolist()
+    
+    logger.info(f"Loaded {record_count} records from file")
+    logger.debug(f"Columns: {columns}")
     
     # Validate expected columns for GCP data
     # Note: Actual column names depend on GCP2 export format
     # Common expected columns: timestamp, z_score, variance, egg_id
     expected_columns = ['timestamp', 'z_score']
-    missing_columns = [col for col in expected_columns if col not in df.columns]
+    missing_columns = [col for col in expected_columns if col not in columns]
     
     if missing_columns:
         logger.warning(f"Missing expected columns: {missing_columns}")
-        logger.info(f"Available columns: {df.columns.tolist()}")
+        logger.info(f"Available columns: {columns}")
     
     # Store processed data
     filename = s3_key.split('/')[-1]
@@ -111,13 +134,14 @@ def process_gcp_file(s3_key: str) -> dict:
     s3_client.put_object(
         Bucket=RAW_BUCKET,
         Key=processed_key,
-        Body=df.to_json(orient='records', date_format='iso'),
+        Body=gzip.compress(body if isinstance(body, bytes) else body.encode(), compresslevel=6),
         ContentType='application/json',
+        ContentEncoding='gzip',
         Metadata={
             'source': 'gcp-upload',
             'original_file': s3_key,
-            'record_count': str(len(df)),
-            'processing_time': datetime.utcnow().isoformat(),
+            'record_count': str(record_count),
+            'processing_time': ingestion_time,
         }
     )
     
@@ -126,35 +150,37 @@ def process_gcp_file(s3_key: str) -> dict:
     return {
         'original_key': s3_key,
         'processed_key': processed_key,
-        'record_count': len(df),
-        'columns': df.columns.tolist(),
+        'record_count': record_count,
+        'columns': columns,
     }
 
 
-def record_metadata(s3_key: str, result: dict, status: str) -> None:
+def record_metadata(batch, s3_key: str, result: dict, status: str, ingestion_time: str) -> None:
     """
     Record processing metadata to DynamoDB.
     
     Args:
+        batch: Writer from metadata_writer()
         s3_key: Original S3 key
         result: Processing results
         status: Processing status
+        ingestion_time: ISO timestamp shared by everything written this invocation
     """
-    if not METADATA_TABLE:
+    if batch is None:
         logger.warning("METADATA_TABLE not configured, skipping metadata recording")
         return
     
-    table = dynamodb.Table(METADATA_TABLE)
-    
-    table.put_item(
+    batch.put_item(
         Item={
             'source_id': 'gcp_upload',
+            'source_type': 'gcp',
+            # Sort key: stays per-record so files from one invocation don't collide
             'timestamp': datetime.utcnow().isoformat(),
             'original_key': s3_key,
             'processed_key': result.get('processed_key', ''),
             'record_count': result.get('record_count', 0),
             'status': status,
-            'ingestion_time': datetime.utcnow().isoformat(),
+            'ingestion_time': ingestion_time,
         }
     )
     
@@ -174,7 +200,10 @@ def lambda_handler(event: dict, context: Any) -> dict:
         dict: Execution results with status and details
     """
     logger.info("=== CHIMERA GCP PROCESSING START ===")
-    logger.info(f"Event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Event: {json.dumps(event)}")
+    
+    ingestion_time = datetime.utcnow().isoformat()
     
     # Determine files to process
     specific_key = event.get('s3_key')
@@ -198,19 +227,30 @@ def lambda_handler(event: dict, context: Any) -> dict:
     results = []
     errors = []
     
-    for s3_key in files_to_process:
-        try:
-            result = process_gcp_file(s3_key)
-            record_metadata(s3_key, result, 'success')
-            results.append(result)
-            
-        except Exception as e:
-            logger.error(f"Error processing {s3_key}: {str(e)}", exc_info=True)
-            errors.append({
-                's3_key': s3_key,
-                'error': str(e),
-            })
-            record_metadata(s3_key, {}, 'failed')
+    # Files are independent, so download, parse and upload them concurrently
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [
+            (s3_key, executor.submit(process_gcp_file, s3_key, ingestion_time))
+            for s3_key in files_to_process
+        ]
+        
+        # Metadata is written from this thread only; batch_writer isn't thread-safe
+        with metadata_writer(metadata_table) as batch:
+            for s3_key, future in futures:
+                try:
+                    result = future.result()
+                    record_metadata(batch, s3_key, result, 'success', ingestion_time)
+                    results.append(result)
+                    
+                except Exception as e:
+                    logger.error(f"Error processing {s3_key}: {str(e)}", exc_info=True)
+                    errors.append({
+                        's3_key': s3_key,
+                        'error': str(e),
+                    })
+                    record_metadata(batch, s3_key, {}, 'failed', ingestion_time)
+    
+    register_entities(metadata_table, 'gcp', ['gcp_upload'], len(results) + len(errors))
     
     logger.info("=== CHIMERA GCP PROCESSING COMPLETE ===")
     logger.info(f"Processed: {len(results)} files, Errors: {len(errors)}")
@@ -13,23 +13,38 @@ Data Sources:
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any
 
 import boto3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common import AWS_CONFIG, metadata_writer, register_entities
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=AWS_CONFIG)
+
+# HTTP session shared by all endpoint fetches; keeps NOAA connections alive
+# across calls and warm invocations
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+))
 
 # Configuration
 RAW_BUCKET = os.environ.get('RAW_BUCKET', '')
 METADATA_TABLE = os.environ.get('METADATA_TABLE', '')
+metadata_table = dynamodb.Table(METADATA_TABLE) if METADATA_TABLE else None
 
 # NOAA SWPC API endpoints
 NOAA_ENDPOINTS = {
@@ -42,15 +57,15 @@ NOAA_ENDPOINTS = {
 }
 
 
-def fetch_noaa_data(endpoint_name: str) -> dict:
+def fetch_noaa_data(endpoint_name: str) -> requests.Response:
     """
-    Fetch data from a NOAA SWPC API endpoint.
+    Open a streaming request to a NOAA SWPC API endpoint.
     
     Args:
         endpoint_name: Name of the endpoint to fetch
     
     Returns:
-        dict: API response data
+        requests.Response: Response with the body not yet read
     """
     url = NOAA_ENDPOINTS.get(endpoint_name)
     if not url:
@@ -59,23 +74,24 @@ def fetch_noaa_data(endpoint_name: str) -> dict:
     logger.info(f"Fetching NOAA data from endpoint: {endpoint_name}")
     logger.debug(f"URL: {url}")
     
-    response = requests.get(url, timeout=30)
+    response = http_session.get(url, stream=True, timeout=30)
     response.raise_for_status()
     
-    data = response.json()
-    logger.info(f"Successfully fetched {len(data) if isinstance(data, list) else 'object'} records from {endpoint_name}")
+    # Undo any Content-Encoding so S3 receives plain JSON
+    response.raw.decode_content = True
     
-    return data
+    return response
 
 
-def store_to_s3(data: Any, endpoint_name: str, date_str: str) -> str:
+def store_to_s3(response: requests.Response, endpoint_name: str, date_str: str, ingestion_time: str) -> str:
     """
-    Store raw NOAA data to S3.
+    Stream a raw NOAA response body to S3 without parsing it.
     
     Args:
-        data: Raw API response data
+        response: Streaming response from fetch_noaa_data
         endpoint_name: Name of the data source endpoint
         date_str: Date string for the data
+        ingestion_time: ISO timestamp shared by everything written this invocation
     
     Returns:
         str: S3 key where data was stored
@@ -84,15 +100,17 @@ def store_to_s3(data: Any, endpoint_name: str, date_str: str) -> str:
     
     logger.info(f"Storing data to s3://{RAW_BUCKET}/{s3_key}")
     
-    s3_client.put_object(
-        Bucket=RAW_BUCKET,
-        Key=s3_key,
-        Body=json.dumps(data, indent=2),
-        ContentType='application/json',
-        Metadata={
-            'source': 'noaa-swpc',
-            'endpoint': endpoint_name,
-            'ingestion_time': datetime.utcnow().isoformat(),
+    s3_client.upload_fileobj(
+        response.raw,
+        RAW_BUCKET,
+        s3_key,
+        ExtraArgs={
+            'ContentType': 'application/json',
+            'Metadata': {
+                'source': 'noaa-swpc',
+                'endpoint': endpoint_name,
+                'ingestion_time': ingestion_time,
+            }
         }
     )
     
@@ -100,31 +118,48 @@ def store_to_s3(data: Any, endpoint_name: str, date_str: str) -> str:
     return s3_key
 
 
-def record_metadata(endpoint_name: str, date_str: str, s3_key: str, status: str, record_count: int = 0) -> None:
+def ingest_endpoint(endpoint_name: str, target_date: str, ingestion_time: str) -> str:
+    """
+    Fetch one NOAA endpoint and stream it to S3.
+    
+    Args:
+        endpoint_name: Name of the endpoint to fetch
+        target_date: Date string for the data
+        ingestion_time: ISO timestamp shared by everything written this invocation
+    
+    Returns:
+        str: S3 key where data was stored
+    """
+    with fetch_noaa_data(endpoint_name) as response:
+        return store_to_s3(response, endpoint_name, target_date, ingestion_time)
+
+
+def record_metadata(batch, endpoint_name: str, date_str: str, s3_key: str, status: str, ingestion_time: str, record_count: int = 0) -> None:
     """
     Record ingestion metadata to DynamoDB.
     
     Args:
+        batch: Writer from metadata_writer()
         endpoint_name: Name of the data source endpoint
         date_str: Date string for the data
         s3_key: S3 key where data was stored
         status: Ingestion status ('success' or 'failed')
-        record_count: Number of records ingested
+        ingestion_time: ISO timestamp shared by everything written this invocation
+        record_count: Number of records ingested (-1 if not counted)
     """
-    if not METADATA_TABLE:
+    if batch is None:
         logger.warning("METADATA_TABLE not configured, skipping metadata recording")
         return
     
-    table = dynamodb.Table(METADATA_TABLE)
-    
-    table.put_item(
+    batch.put_item(
         Item={
             'source_id': f'geomagnetic_{endpoint_name}',
+            'source_type': 'geomagnetic',
             'timestamp': date_str,
             's3_key': s3_key,
             'status': status,
             'record_count': record_count,
-            'ingestion_time': datetime.utcnow().isoformat(),
+            'ingestion_time': ingestion_time,
         }
     )
     
@@ -143,12 +178,16 @@ def lambda_handler(event: dict, context: Any) -> dict:
         dict: Execution results with status and details
     """
     logger.info("=== CHIMERA GEOMAGNETIC INGESTION START ===")
-    logger.info(f"Event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Event: {json.dumps(event)}")
+    
+    now = datetime.utcnow()
+    ingestion_time = now.isoformat()
     
     # Parse parameters
     target_date = event.get('date')
     if not target_date:
-        target_date = datetime.utcnow().strftime('%Y-%m-%d')
+        target_date = now.strftime('%Y-%m-%d')
     
     endpoints = event.get('endpoints', list(NOAA_ENDPOINTS.keys()))
     
@@ -158,34 +197,45 @@ def lambda_handler(event: dict, context: Any) -> dict:
     results = []
     errors = []
     
-    for endpoint_name in endpoints:
-        try:
-            # Fetch data from API
-            data = fetch_noaa_data(endpoint_name)
-            
-            # Count records
-            record_count = len(data) if isinstance(data, list) else 1
-            
-            # Store to S3
-            s3_key = store_to_s3(data, endpoint_name, target_date)
-            
-            # Record metadata
-            record_metadata(endpoint_name, target_date, s3_key, 'success', record_count)
-            
-            results.append({
-                'endpoint': endpoint_name,
-                's3_key': s3_key,
-                'record_count': record_count,
-                'status': 'success',
-            })
-            
-        except Exception as e:
-            logger.error(f"Error processing endpoint {endpoint_name}: {str(e)}", exc_info=True)
-            errors.append({
-                'endpoint': endpoint_name,
-                'error': str(e),
-            })
-            record_metadata(endpoint_name, target_date, '', 'failed')
+    # Fetch and store every endpoint concurrently; each is an independent HTTPS round trip
+    with ThreadPoolExecutor(max_workers=len(NOAA_ENDPOINTS)) as executor:
+        futures = [
+            (endpoint_name, executor.submit(ingest_endpoint, endpoint_name, target_date, ingestion_time))
+            for endpoint_name in endpoints
+        ]
+        
+        # Metadata is written from this thread only; batch_writer isn't thread-safe
+        with metadata_writer(metadata_table) as batch:
+            for endpoint_name, future in futures:
+                try:
+                    s3_key = future.result()
+                    
+                    # The body is never parsed, so the record count is unknown
+                    record_count = -1
+                    
+                    # Record metadata
+                    record_metadata(batch, endpoint_name, target_date, s3_key, 'success', ingestion_time, record_count)
+                    
+                    results.append({
+                        'endpoint': endpoint_name,
+                        's3_key': s3_key,
+                        'record_count': record_count,
+                        'status': 'success',
+                    })
+                    
+                except Exception as e:
+                    logger.error(f"Error processing endpoint {endpoint_name}: {str(e)}", exc_info=True)
+                    errors.append({
+                        'endpoint': endpoint_name,
+                        'error': str(e),
+                    })
+                    record_metadata(batch, endpoint_name, target_date, '', 'failed', ingestion_time)
+    
+    register_entities(
+        metadata_table, 'geomagnetic',
+        [f'geomagnetic_{endpoint_name}' for endpoint_name in endpoints],
+        len(results) + len(errors),
+    )
     
     logger.info("=== CHIMERA GEOMAGNETIC INGESTION COMPLETE ===")
     logger.info(f"Processed: {len(results)} endpoints, Errors: {len(errors)}")
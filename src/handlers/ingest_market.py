@@ -12,28 +12,49 @@ Note:
 - For historical backfill, use daily data and interpolate
 """
 
+import io
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Any, List
 
 import boto3
-import yfinance as yf
+from boto3.s3.transfer import TransferConfig
 import pandas as pd
 
+from common import AWS_CONFIG, metadata_writer, register_entities
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
 
 # Configuration
 RAW_BUCKET = os.environ.get('RAW_BUCKET', '')
 METADATA_TABLE = os.environ.get('METADATA_TABLE', '')
 
+
+@lru_cache(maxsize=None)
+def get_metadata_table():
+    """Metadata Table resource, created on first use; None if METADATA_TABLE is unset."""
+    if not METADATA_TABLE:
+        return None
+    return boto3.resource('dynamodb', config=AWS_CONFIG).Table(METADATA_TABLE)
+
+
+# Multipart settings for processed-data uploads: parts upload in parallel above 8MB
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+
 # Target symbols for Chimera
 # Organized by category for correlation analysis with environmental/cosmic factors
 DEFAULT_SYMBOLS = [
@@ -96,45 +117,58 @@ def fetch_market_data(symbols: List[str], start_date: str, end_date: str, interv
     Returns:
         dict: Dictionary of symbol -> DataFrame
     """
+    # yfinance pulls in a large import graph; load it only when fetching
+    import yfinance as yf
+    
     logger.info(f"Fetching market data for {len(symbols)} symbols")
     logger.info(f"Date range: {start_date} to {end_date}, interval: {interval}")
     
+    # One batched download; yfinance fetches the symbols on its own thread pool.
+    # auto_adjust/actions/ignore_tz match Ticker.history() output.
+    raw = yf.download(
+        symbols,
+        start=start_date,
+        end=end_date,
+        interval=interval,
+        group_by='ticker',
+        auto_adjust=True,
+        actions=True,
+        ignore_tz=False,
+        threads=True,
+        progress=False,
+    )
+    
     results = {}
     
     for symbol in symbols:
-        try:
-            logger.debug(f"Downloading data for {symbol}")
-            
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(start=start_date, end=end_date, interval=interval)
-            
-            if df.empty:
+        if isinstance(raw.columns, pd.MultiIndex):
+            if symbol not in raw.columns.get_level_values(0):
                 logger.warning(f"No data returned for {symbol}")
                 continue
-            
-            # Reset index to make date a column
-            df = df.reset_index()
-            
-            # Rename columns to lowercase
-            df.columns = [col.lower().replace(' ', '_') for col in df.columns]
-            
-            # Convert datetime to string for JSON serialization
-            if 'date' in df.columns:
-                df['date'] = df['date'].astype(str)
-            if 'datetime' in df.columns:
-                df['datetime'] = df['datetime'].astype(str)
-            
-            results[symbol] = df
-            logger.info(f"Fetched {len(df)} records for {symbol}")
-            
-        except Exception as e:
-            logger.error(f"Error fetching {symbol}: {str(e)}")
-            raise
+            df = raw[symbol]
+        else:
+            df = raw
+        
+        # Failed or empty symbols come back as all-NaN rows
+        df = df.dropna(how='all')
+        
+        if df.empty:
+            logger.warning(f"No data returned for {symbol}")
+            continue
+        
+        # Reset index to make date a column
+        df = df.reset_index()
+        
+        # Rename columns to lowercase; timestamps keep their dtype (Parquet stores them natively)
+        df.columns = df.columns.str.lower().str.replace(' ', '_')
+        
+        results[symbol] = df
+        logger.info(f"Fetched {len(df)} records for {symbol}")
     
     return results
 
 
-def store_to_s3(data: pd.DataFrame, symbol: str, date_str: str, interval: str) -> str:
+def store_to_s3(data: pd.DataFrame, symbol: str, date_str: str, interval: str, ingestion_time: str) -> str:
     """
     Store market data to S3.
     
@@ -143,60 +177,70 @@ def store_to_s3(data: pd.DataFrame, symbol: str, date_str: str, interval: str) -
         symbol: Ticker symbol
         date_str: Date string for the data
         interval: Data interval used
+        ingestion_time: ISO timestamp shared by everything written this invocation
     
     Returns:
         str: S3 key where data was stored
     """
     # Clean symbol for S3 key (remove special characters)
     clean_symbol = symbol.replace('^', '').replace('.', '_')
-    s3_key = f"market/{clean_symbol}/{interval}/{date_str}.json"
+    s3_key = f"market/{clean_symbol}/{interval}/{date_str}.parquet"
     
     logger.info(f"Storing data to s3://{RAW_BUCKET}/{s3_key}")
     
-    s3_client.put_object(
-        Bucket=RAW_BUCKET,
-        Key=s3_key,
-        Body=data.to_json(orient='records', date_format='iso'),
-        ContentType='application/json',
-        Metadata={
-            'source': 'yahoo-finance',
-            'symbol': symbol,
-            'interval': interval,
-            'record_count': str(len(data)),
-            'ingestion_time': datetime.utcnow().isoformat(),
-        }
+    buffer = io.BytesIO()
+    data.to_parquet(buffer, engine='pyarrow', compression='snappy', index=False)
+    buffer.seek(0)
+    
+    s3_client.upload_fileobj(
+        buffer,
+        RAW_BUCKET,
+        s3_key,
+        ExtraArgs={
+            'ContentType': 'application/vnd.apache.parquet',
+            'Metadata': {
+                'source': 'yahoo-finance',
+                'symbol': symbol,
+                'interval': interval,
+                'record_count': str(len(data)),
+                'ingestion_time': ingestion_time,
+            }
+        },
+        Config=TRANSFER_CONFIG,
     )
     
     logger.info(f"Successfully stored {len(data)} records to S3")
     return s3_key
 
 
-def record_metadata(symbol: str, date_str: str, s3_key: str, status: str, record_count: int = 0) -> None:
+def record_metadata(batch, symbol: str, date_str: str, s3_key: str, status: str, ingestion_time: str, record_count: int = 0) -> None:
     """
     Record ingestion metadata to DynamoDB.
     
     Args:
+        batch: Writer from metadata_writer()
         symbol: Ticker symbol
         date_str: Date string for the data
         s3_key: S3 key where data was stored
         status: Ingestion status
+        ingestion_time: ISO timestamp shared by everything written this invocation
         record_count: Number of records ingested
     """
-    if not METADATA_TABLE:
+    if batch is None:
         logger.warning("METADATA_TABLE not configured, skipping metadata recording")
         return
     
-    table = dynamodb.Table(METADATA_TABLE)
     clean_symbol = symbol.replace('^', '').replace('.', '_')
     
-    table.put_item(
+    batch.put_item(
         Item={
             'source_id': f'market_{clean_symbol}',
+            'source_type': 'market',
             'timestamp': date_str,
             's3_key': s3_key,
             'status': status,
             'record_count': record_count,
-            'ingestion_time': datetime.utcnow().isoformat(),
+            'ingestion_time': ingestion_time,
         }
     )
     
@@ -220,6 +264,10 @@ def lambda_handler(event: dict, context: Any) -> dict:
     logger.info("=== CHIMERA MARKET INGESTION START ===")
     logger.info(f"Event: {json.dumps(event)}")
     
+    # One timestamp per invocation keeps S3 and DynamoDB records consistent
+    now = datetime.utcnow()
+    ingestion_time = now.isoformat()
+    
     # Parse parameters
     interval = event.get('interval', '1d')
     symbols = event.get('symbols', DEFAULT_SYMBOLS)
@@ -236,8 +284,8 @@ def lambda_handler(event: dict, context: Any) -> dict:
             end_date = (datetime.strptime(target_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
         else:
             # Default: fetch last 30 days of data
-            end_date = datetime.utcnow().strftime('%Y-%m-%d')
-            start_date = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+            end_date = now.strftime('%Y-%m-%d')
+            start_date = (now - timedelta(days=30)).strftime('%Y-%m-%d')
     
     logger.info(f"Date range: {start_date} to {end_date}")
     logger.info(f"Symbols: {symbols}")
@@ -250,26 +298,38 @@ def lambda_handler(event: dict, context: Any) -> dict:
         # Fetch all data
         market_data = fetch_market_data(symbols, start_date, end_date, interval)
         
-        # Store each symbol's data
-        for symbol, df in market_data.items():
-            try:
-                s3_key = store_to_s3(df, symbol, start_date, interval)
-                record_metadata(symbol, start_date, s3_key, 'success', len(df))
-                
-                results.append({
-                    'symbol': symbol,
-                    's3_key': s3_key,
-                    'record_count': len(df),
-                    'status': 'success',
-                })
-                
-            except Exception as e:
-                logger.error(f"Error storing {symbol}: {str(e)}", exc_info=True)
-                errors.append({
-                    'symbol': symbol,
-                    'error': str(e),
-                })
-                record_metadata(symbol, start_date, '', 'failed')
+        # Store each symbol's data; Parquet encoding and uploads overlap across threads
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(market_data)))) as executor:
+            futures = [
+                (symbol, df, executor.submit(store_to_s3, df, symbol, start_date, interval, ingestion_time))
+                for symbol, df in market_data.items()
+            ]
+            
+            # Metadata is written from this thread only; batch_writer isn't thread-safe
+            with metadata_writer(get_metadata_table()) as batch:
+                for symbol, df, future in futures:
+                    try:
+                        s3_key = future.result()
+                        record_metadata(batch, symbol, start_date, s3_key, 'success', ingestion_time, len(df))
+                        
+                        results.append({
+                            'symbol': symbol,
+                            's3_key': s3_key,
+                            'record_count': len(df),
+                            'status': 'success',
+                        })
+                        
+                    except Exception as e:
+                        logger.error(f"Error storing {symbol}: {str(e)}", exc_info=True)
+                        errors.append({
+                            'symbol': symbol,
+                            'error': str(e),
+                        })
+                        record_metadata(batch, symbol, start_date, '', 'failed', ingestion_time)
+        
+        register_entities(get_metadata_table(), 'market', [
+            f"market_{symbol.replace('^', '').replace('.', '_')}" for symbol in market_data
+        ], len(futures))
         
     except Exception as e:
         logger.error(f"Error fetching market data: {str(e)}", exc_info=True)
@@ -8,28 +8,48 @@ Data Source: https://ssd.jpl.nasa.gov/api/horizons.api
 Documentation: https://ssd-api.jpl.nasa.gov/doc/horizons.html
 """
 
+import gzip
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any
 from urllib.parse import urlencode
 
 import boto3
+from botocore.exceptions import ClientError
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common import AWS_CONFIG, metadata_writer, register_entities
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=AWS_CONFIG)
+
+# HTTP session shared by all Horizons fetches; keeps the TLS connection to
+# ssd.jpl.nasa.gov alive across bodies and warm invocations
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+))
 
 # Configuration
 RAW_BUCKET = os.environ.get('RAW_BUCKET', '')
 METADATA_TABLE = os.environ.get('METADATA_TABLE', '')
+metadata_table = dynamodb.Table(METADATA_TABLE) if METADATA_TABLE else None
 HORIZONS_API_URL = 'https://ssd.jpl.nasa.gov/api/horizons.api'
+ROLLUP_KEY = 'planetary/latest.json'  # Latest data for every body in one object
+ROLLUP_WRITE_ATTEMPTS = 5  # conditional rollup writes retried after a concurrent update
 
 # Celestial bodies to track (Horizons IDs)
 CELESTIAL_BODIES = {
@@ -79,7 +99,7 @@ def fetch_planetary_data(body_id: str, start_date: str, end_date: str) -> dict:
     url = f"{HORIZONS_API_URL}?{urlencode(params, safe="'")}"
     logger.debug(f"Request URL: {url}")
     
-    response = requests.get(url, timeout=60)
+    response = http_session.get(url, timeout=60)
     response.raise_for_status()
     
     data = response.json()
@@ -88,7 +108,7 @@ def fetch_planetary_data(body_id: str, start_date: str, end_date: str) -> dict:
     return data
 
 
-def store_to_s3(data: dict, body_id: str, date_str: str) -> str:
+def store_to_s3(data: dict, body_id: str, date_str: str, ingestion_time: str) -> str:
     """
     Store raw planetary data to S3.
     
@@ -96,6 +116,7 @@ def store_to_s3(data: dict, body_id: str, date_str: str) -> str:
         data: Raw API response data
         body_id: Horizons body identifier
         date_str: Date string for the data
+        ingestion_time: ISO timestamp shared by everything written this invocation
     
     Returns:
         str: S3 key where data was stored
@@ -108,13 +129,14 @@ def store_to_s3(data: dict, body_id: str, date_str: str) -> str:
     s3_client.put_object(
         Bucket=RAW_BUCKET,
         Key=s3_key,
-        Body=json.dumps(data, indent=2),
+        Body=gzip.compress(orjson.dumps(data)),
         ContentType='application/json',
+        ContentEncoding='gzip',
         Metadata={
             'source': 'nasa-jpl-horizons',
             'body_id': body_id,
             'body_name': body_name,
-            'ingestion_time': datetime.utcnow().isoformat(),
+            'ingestion_time': ingestion_time,
         }
     )
     
@@ -122,30 +144,105 @@ def store_to_s3(data: dict, body_id: str, date_str: str) -> str:
     return s3_key
 
 
-def record_metadata(body_id: str, date_str: str, s3_key: str, status: str) -> None:
+def ingest_body(body_id: str, start_date: str, end_date: str, target_date: str, ingestion_time: str) -> tuple:
+    """
+    Fetch one body from Horizons and store it to S3.
+    
+    Args:
+        body_id: Horizons body identifier
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+        target_date: Date string used for the S3 key
+        ingestion_time: ISO timestamp shared by everything written this invocation
+    
+    Returns:
+        tuple: (API response data, S3 key where data was stored)
+    """
+    data = fetch_planetary_data(body_id, start_date, end_date)
+    return data, store_to_s3(data, body_id, target_date, ingestion_time)
+
+
+def update_rollup(bodies: dict, ingestion_time: str) -> None:
+    """
+    Merge freshly ingested bodies into the planetary/latest.json rollup.
+    
+    The dashboard serves /data/planetary from this single object instead of
+    one S3 GET per body. The rollup is {'ingested_at': {body: time}, 'data':
+    {body: data}}, so the dashboard can tell when a body has gone stale.
+    
+    The write is conditional on the ETag that was read: if an overlapping
+    invocation updated the rollup in between, the merge is redone on top of
+    its version instead of dropping its bodies.
+    
+    Args:
+        bodies: Mapping of body name to raw API response data
+        ingestion_time: ISO timestamp of this invocation
+    """
+    for _ in range(ROLLUP_WRITE_ATTEMPTS):
+        try:
+            obj = s3_client.get_object(Bucket=RAW_BUCKET, Key=ROLLUP_KEY)
+            rollup = orjson.loads(obj['Body'].read())
+            condition = {'IfMatch': obj['ETag']}
+        except s3_client.exceptions.NoSuchKey:
+            rollup = {}
+            condition = {'IfNoneMatch': '*'}
+        
+        # Rollups written before per-body timestamps are rebuilt from scratch
+        ingested_at = rollup.get('ingested_at', {})
+        data = rollup.get('data', {}) if ingested_at else {}
+        
+        for name, body in bodies.items():
+            # Never replace a body with an older fetch from a slower overlapping run
+            if ingested_at.get(name, '') <= ingestion_time:
+                data[name] = body
+                ingested_at[name] = ingestion_time
+        
+        try:
+            s3_client.put_object(
+                Bucket=RAW_BUCKET,
+                Key=ROLLUP_KEY,
+                Body=orjson.dumps({'ingested_at': ingested_at, 'data': data}),
+                ContentType='application/json',
+                **condition,
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                logger.info("Rollup changed since it was read; merging again")
+                continue
+            raise
+        
+        logger.info(f"Updated rollup s3://{RAW_BUCKET}/{ROLLUP_KEY} with {len(bodies)} bodies")
+        return
+    
+    raise RuntimeError(f"Rollup kept changing; gave up after {ROLLUP_WRITE_ATTEMPTS} attempts")
+
+
+def record_metadata(batch, body_id: str, date_str: str, s3_key: str, status: str, ingestion_time: str) -> None:
     """
     Record ingestion metadata to DynamoDB.
     
     Args:
+        batch: Writer from metadata_writer()
         body_id: Horizons body identifier
         date_str: Date string for the data
         s3_key: S3 key where data was stored
         status: Ingestion status ('success' or 'failed')
+        ingestion_time: ISO timestamp shared by everything written this invocation
     """
-    if not METADATA_TABLE:
+    if batch is None:
         logger.warning("METADATA_TABLE not configured, skipping metadata recording")
         return
     
-    table = dynamodb.Table(METADATA_TABLE)
     body_name = CELESTIAL_BODIES.get(body_id, f'body_{body_id}')
     
-    table.put_item(
+    batch.put_item(
         Item={
             'source_id': f'planetary_{body_name}',
+            'source_type': 'planetary',
             'timestamp': date_str,
             's3_key': s3_key,
             'status': status,
-            'ingestion_time': datetime.utcnow().isoformat(),
+            'ingestion_time': ingestion_time,
         }
     )
     
@@ -166,6 +263,10 @@ def lambda_handler(event: dict, context: Any) -> dict:
     logger.info("=== CHIMERA PLANETARY INGESTION START ===")
     logger.info(f"Event: {json.dumps(event)}")
     
+    # Shared by every S3 object and metadata item written below
+    now = datetime.utcnow()
+    ingestion_time = now.isoformat()
+    
     # Parse parameters
     target_date = event.get('date')
     days_back = event.get('days_back', 7)  # Default to 7 days of data
@@ -176,43 +277,62 @@ def lambda_handler(event: dict, context: Any) -> dict:
         end_date = (datetime.strptime(target_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
     else:
         # Default: fetch last N days of data
-        end_date = datetime.utcnow().strftime('%Y-%m-%d')
-        start_date = (datetime.utcnow() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+        end_date = now.strftime('%Y-%m-%d')
+        start_date = (now - timedelta(days=days_back)).strftime('%Y-%m-%d')
         target_date = start_date  # Use start date for S3 key
     
     body_ids = event.get('body_ids', list(CELESTIAL_BODIES.keys()))
+    body_names = {body_id: CELESTIAL_BODIES.get(body_id, f'body_{body_id}') for body_id in body_ids}
     
     logger.info(f"Processing date range: {start_date} to {end_date}")
     logger.info(f"Processing bodies: {body_ids}")
     
     results = []
     errors = []
+    ingested = {}
+    
+    # Horizons calls are independent, so fetch and store all bodies concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(body_ids)))) as executor:
+        futures = [
+            (body_id, executor.submit(ingest_body, body_id, start_date, end_date, target_date, ingestion_time))
+            for body_id in body_ids
+        ]
+        
+        # Metadata is written from this thread only; batch_writer isn't thread-safe
+        with metadata_writer(metadata_table) as batch:
+            for body_id, future in futures:
+                try:
+                    data, s3_key = future.result()
+                    
+                    # Record metadata
+                    record_metadata(batch, body_id, target_date, s3_key, 'success', ingestion_time)
+                    ingested[body_names[body_id]] = data
+                    
+                    results.append({
+                        'body_id': body_id,
+                        'body_name': body_names[body_id],
+                        's3_key': s3_key,
+                        'status': 'success',
+                    })
+                    
+                except Exception as e:
+                    logger.error(f"Error processing body {body_id}: {str(e)}", exc_info=True)
+                    errors.append({
+                        'body_id': body_id,
+                        'error': str(e),
+                    })
+                    record_metadata(batch, body_id, target_date, '', 'failed', ingestion_time)
+    
+    register_entities(metadata_table, 'planetary', [
+        f"planetary_{body_names[body_id]}" for body_id in body_ids
+    ], len(results) + len(errors))
     
-    for body_id in body_ids:
+    if ingested:
         try:
-            # Fetch data from API
-            data = fetch_planetary_data(body_id, start_date, end_date)
-            
-            # Store to S3
-            s3_key = store_to_s3(data, body_id, target_date)
-            
-            # Record metadata
-            record_metadata(body_id, target_date, s3_key, 'success')
-            
-            results.append({
-                'body_id': body_id,
-                'body_name': CELESTIAL_BODIES.get(body_id, 'Unknown'),
-                's3_key': s3_key,
-                'status': 'success',
-            })
-            
+            update_rollup(ingested, ingestion_time)
         except Exception as e:
-            logger.error(f"Error processing body {body_id}: {str(e)}", exc_info=True)
-            errors.append({
-                'body_id': body_id,
-                'error': str(e),
-            })
-            record_metadata(body_id, target_date, '', 'failed')
+            # Non-fatal: the dashboard falls back to per-body objects
+            logger.error(f"Error updating planetary rollup: {str(e)}", exc_info=True)
     
     logger.info("=== CHIMERA PLANETARY INGESTION COMPLETE ===")
     logger.info(f"Processed: {len(results)} bodies, Errors: {len(errors)}")
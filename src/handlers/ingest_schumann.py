@@ -12,32 +12,56 @@ Data Sources:
 - Zenodo Datasets: https://zenodo.org/ (search "Schumann Resonance")
 """
 
+import io
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Any
+from urllib.parse import unquote_plus
 
 import boto3
+import orjson
+from boto3.s3.transfer import TransferConfig
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from common import AWS_CONFIG, metadata_writer, register_entities
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=AWS_CONFIG)
 
 # Configuration
 RAW_BUCKET = os.environ.get('RAW_BUCKET', '')
 PROCESSED_BUCKET = os.environ.get('PROCESSED_BUCKET', '')
 METADATA_TABLE = os.environ.get('METADATA_TABLE', '')
+metadata_table = dynamodb.Table(METADATA_TABLE) if METADATA_TABLE else None
 
 # Expected input format for manually uploaded files
 # Files should be in: s3://chimera-raw-{env}/schumann/uploads/{filename}.csv
 UPLOAD_PREFIX = 'schumann/uploads/'
 PROCESSED_PREFIX = 'schumann/processed/'
+MAX_WORKERS = 4  # files processed concurrently
+
+# Large uploads are downloaded as parallel byte-range GETs
+RANGE_GET_THRESHOLD = 8 * 1024 * 1024
+RANGE_GET_PARTS = 8
+
+# Multipart settings for processed-data uploads: parts upload in parallel above 8MB
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
 
 
 def list_pending_files() -> list:
@@ -49,27 +73,99 @@ def list_pending_files() -> list:
     """
     logger.info(f"Scanning for pending files in s3://{RAW_BUCKET}/{UPLOAD_PREFIX}")
     
-    response = s3_client.list_objects_v2(
-        Bucket=RAW_BUCKET,
-        Prefix=UPLOAD_PREFIX,
-    )
+    # A single list call stops at 1000 keys; page through the whole prefix
+    paginator = s3_client.get_paginator('list_objects_v2')
+    pages = paginator.paginate(Bucket=RAW_BUCKET, Prefix=UPLOAD_PREFIX)
     
-    files = []
-    for obj in response.get('Contents', []):
-        key = obj['Key']
-        if key.endswith('.csv') or key.endswith('.json'):
-            files.append(key)
+    files = [
+        obj['Key']
+        for page in pages
+        for obj in page.get('Contents', [])
+        if obj['Key'].endswith(('.csv', '.json'))
+    ]
     
     logger.info(f"Found {len(files)} pending files")
     return files
 
 
-def process_schumann_file(s3_key: str) -> dict:
+def keys_from_s3_event(event: dict) -> list:
+    """
+    Extract uploaded object keys from an S3 ObjectCreated notification.
+    
+    Args:
+        event: Lambda event delivered by the S3 bucket notification
+    
+    Returns:
+        list: S3 keys of the uploaded files (empty if the event has no records)
+    """
+    # Keys arrive URL-encoded in the notification payload
+    return [
+        unquote_plus(record['s3']['object']['key'])
+        for record in event.get('Records', [])
+        if record.get('eventSource') == 'aws:s3'
+    ]
+
+
+def open_raw_file(s3_key: str):
+    """
+    Open an uploaded file for reading.
+    
+    Small files are streamed from a single GET. Files above
+    RANGE_GET_THRESHOLD are fetched as RANGE_GET_PARTS concurrent byte-range
+    GETs, since one stream is limited to a fraction of the Lambda's bandwidth.
+    
+    Args:
+        s3_key: S3 key of the uploaded file
+    
+    Returns:
+        File-like object over the object's contents
+    """
+    size = s3_client.head_object(Bucket=RAW_BUCKET, Key=s3_key)['ContentLength']
+    
+    if size <= RANGE_GET_THRESHOLD:
+        return s3_client.get_object(Bucket=RAW_BUCKET, Key=s3_key)['Body']
+    
+    part_size = -(-size // RANGE_GET_PARTS)
+    ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+    
+    def fetch_range(byte_range: tuple) -> bytes:
+        response = s3_client.get_object(
+            Bucket=RAW_BUCKET,
+            Key=s3_key,
+            Range=f"bytes={byte_range[0]}-{byte_range[1]}",
+        )
+        return response['Body'].read()
+    
+    logger.info(f"Fetching {size} bytes in {len(ranges)} ranged GETs")
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        parts = list(executor.map(fetch_range, ranges))
+    
+    return pa.BufferReader(b''.join(parts))
+
+
+def records_to_table(data) -> pa.Table:
+    """
+    Build an Arrow table from decoded JSON records.
+    
+    Columns Arrow can't type on its own (numbers mixed with strings such as
+    "n/a") are stored as strings rather than failing the whole file.
+    """
+    df = pd.DataFrame(data)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].astype(str).where(df[col].notna(), None)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def process_schumann_file(s3_key: str, ingestion_time: str) -> dict:
     """
     Process a single Schumann data file.
     
     Args:
         s3_key: S3 key of the file to process
+        ingestion_time: ISO timestamp shared by everything written this invocation
     
     Returns:
         dict: Processing results
@@ -77,46 +173,57 @@ def process_schumann_file(s3_key: str) -> dict:
     logger.info(f"Processing file: {s3_key}")
     
     # Download file
-    response = s3_client.get_object(Bucket=RAW_BUCKET, Key=s3_key)
-    content = response['Body'].read()
+    body = open_raw_file(s3_key)
     
-    # Determine file type and parse
+    # Determine file type and parse into an Arrow table
     if s3_key.endswith('.csv'):
-        df = pd.read_csv(pd.io.common.BytesIO(content))
+        # Arrow's multithreaded C++ parser reads the S3 stream block by block
+        table = pacsv.read_csv(
+            body,
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=8 * 1024 * 1024),
+        )
     elif s3_key.endswith('.json'):
-        data = json.loads(content.decode('utf-8'))
-        df = pd.DataFrame(data)
+        table = records_to_table(orjson.loads(body.read()))
     else:
         raise ValueError(f"Unsupported file format: {s3_key}")
     
-    logger.info(f"Loaded {len(df)} records from file")
-    logger.debug(f"Columns: {df.columns.tolist()}")
+    columns = table.column_names
+    
+    logger.info(f"Loaded {table.num_rows} records from file")
+    logger.debug(f"Columns: {columns}")
     
     # Validate expected columns
     # Note: Actual column names will depend on the source data format
     # This is a placeholder that should be adjusted based on real data
     expected_columns = ['timestamp', 'power', 'frequency']
-    missing_columns = [col for col in expected_columns if col not in df.columns]
+    missing_columns = [col for col in expected_columns if col not in columns]
     
     if missing_columns:
         logger.warning(f"Missing expected columns: {missing_columns}")
-        logger.info(f"Available columns: {df.columns.tolist()}")
-    
-    # Store processed data
-    filename = s3_key.split('/')[-1].replace('.csv', '.json').replace('.json', '.json')
-    processed_key = f"{PROCESSED_PREFIX}{filename}"
-    
-    s3_client.put_object(
-        Bucket=RAW_BUCKET,
-        Key=processed_key,
-        Body=df.to_json(orient='records', date_format='iso'),
-        ContentType='application/json',
-        Metadata={
-            'source': 'schumann-upload',
-            'original_file': s3_key,
-            'record_count': str(len(df)),
-            'processing_time': datetime.utcnow().isoformat(),
-        }
+        logger.info(f"Available columns: {columns}")
+    
+    # Store processed data (Arrow table straight to Parquet, no pandas round-trip)
+    base_name = s3_key.split('/')[-1].rsplit('.', 1)[0]
+    processed_key = f"{PROCESSED_PREFIX}{base_name}.parquet"
+    
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression='snappy')
+    buffer.seek(0)
+    
+    s3_client.upload_fileobj(
+        buffer,
+        RAW_BUCKET,
+        processed_key,
+        ExtraArgs={
+            'ContentType': 'application/vnd.apache.parquet',
+            'Metadata': {
+                'source': 'schumann-upload',
+                'original_file': s3_key,
+                'record_count': str(table.num_rows),
+                'processing_time': ingestion_time,
+            }
+        },
+        Config=TRANSFER_CONFIG,
     )
     
     logger.info(f"Stored processed data to s3://{RAW_BUCKET}/{processed_key}")
@@ -124,35 +231,38 @@ def process_schumann_file(s3_key: str) -> dict:
     return {
         'original_key': s3_key,
         'processed_key': processed_key,
-        'record_count': len(df),
-        'columns': df.columns.tolist(),
+        'record_count': table.num_rows,
+        'columns': columns,
     }
 
 
-def record_metadata(s3_key: str, result: dict, status: str) -> None:
+def record_metadata(batch, s3_key: str, result: dict, status: str, ingestion_time: str) -> None:
     """
     Record processing metadata to DynamoDB.
     
     Args:
+        batch: Writer from metadata_writer()
         s3_key: Original S3 key
         result: Processing results
         status: Processing status
+        ingestion_time: ISO timestamp shared by everything written this invocation
     """
-    if not METADATA_TABLE:
+    if batch is None:
         logger.warning("METADATA_TABLE not configured, skipping metadata recording")
         return
     
-    table = dynamodb.Table(METADATA_TABLE)
     
-    table.put_item(
+    batch.put_item(
         Item={
             'source_id': 'schumann_upload',
+            'source_type': 'schumann',
+            # Sort key: stays per-record so files from one invocation don't collide
             'timestamp': datetime.utcnow().isoformat(),
             'original_key': s3_key,
             'processed_key': result.get('processed_key', ''),
             'record_count': result.get('record_count', 0),
             'status': status,
-            'ingestion_time': datetime.utcnow().isoformat(),
+            'ingestion_time': ingestion_time,
         }
     )
     
@@ -165,8 +275,13 @@ def lambda_handler(event: dict, context: Any) -> dict:
     
     This function processes manually uploaded Schumann data files.
     
+    Invoked by the raw bucket's ObjectCreated notification for each upload,
+    or manually to backfill.
+    
     Event Parameters:
-        s3_key: Optional specific file to process. If not provided, processes all pending files.
+        Records: S3 notification records; each uploaded key is processed.
+        s3_key: Optional specific file to process. If neither is provided,
+            processes all pending files.
     
     Returns:
         dict: Execution results with status and details
@@ -174,9 +289,14 @@ def lambda_handler(event: dict, context: Any) -> dict:
     logger.info("=== CHIMERA SCHUMANN PROCESSING START ===")
     logger.info(f"Event: {json.dumps(event)}")
     
+    ingestion_time = datetime.utcnow().isoformat()
+    
     # Determine files to process
+    event_keys = keys_from_s3_event(event)
     specific_key = event.get('s3_key')
-    if specific_key:
+    if event_keys:
+        files_to_process = event_keys
+    elif specific_key:
         files_to_process = [specific_key]
     else:
         files_to_process = list_pending_files()
@@ -196,19 +316,27 @@ def lambda_handler(event: dict, context: Any) -> dict:
     results = []
     errors = []
     
-    for s3_key in files_to_process:
-        try:
-            result = process_schumann_file(s3_key)
-            record_metadata(s3_key, result, 'success')
-            results.append(result)
-            
-        except Exception as e:
-            logger.error(f"Error processing {s3_key}: {str(e)}", exc_info=True)
-            errors.append({
-                's3_key': s3_key,
-                'error': str(e),
-            })
-            record_metadata(s3_key, {}, 'failed')
+    # Files are independent; Arrow parsing and S3 I/O release the GIL, so threads overlap well
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [(s3_key, executor.submit(process_schumann_file, s3_key, ingestion_time)) for s3_key in files_to_process]
+        
+        # Metadata is written from this thread only; batch_writer isn't thread-safe
+        with metadata_writer(metadata_table) as batch:
+            for s3_key, future in futures:
+                try:
+                    result = future.result()
+                    record_metadata(batch, s3_key, result, 'success', ingestion_time)
+                    results.append(result)
+                    
+                except Exception as e:
+                    logger.error(f"Error processing {s3_key}: {str(e)}", exc_info=True)
+                    errors.append({
+                        's3_key': s3_key,
+                        'error': str(e),
+                    })
+                    record_metadata(batch, s3_key, {}, 'failed', ingestion_time)
+    
+    register_entities(metadata_table, 'schumann', ['schumann_upload'], len(results) + len(errors))
     
     logger.info("=== CHIMERA SCHUMANN PROCESSING COMPLETE ===")
     logger.info(f"Processed: {len(results)} files, Errors: {len(errors)}")
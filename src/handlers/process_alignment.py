@@ -9,36 +9,122 @@ Process:
 2. Create a master hourly DateIndex.
 3. Resample/Interpolate each source to match the master index.
 4. Merge into a single wide DataFrame.
-5. Save to Processed S3 Bucket.
+5. Save to Processed S3 Bucket as Parquet.
 """
 
-import json
+import gzip
 import logging
 import os
-import io
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from tempfile import SpooledTemporaryFile
 from typing import Any, Dict, List
 
 import boto3
+from boto3.dynamodb.conditions import Key
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 import pandas as pd
 import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from common import AWS_CONFIG
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
+# Column selections below share data instead of copying it. Copy-on-Write is
+# always on from pandas 3.0, where the option is deprecated
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=AWS_CONFIG)
 
 # Configuration
 RAW_BUCKET = os.environ.get('RAW_BUCKET', '')
 PROCESSED_BUCKET = os.environ.get('PROCESSED_BUCKET', '')
 METADATA_TABLE = os.environ.get('METADATA_TABLE', '')
+SOURCE_TYPE_INDEX = 'by_source_type'  # GSI: source_type (HASH) + ingestion_time (RANGE)
+
+# Candidate timestamp columns, in order of preference
+TIMESTAMP_COLUMNS = ['Date', 'date', 'timestamp', 'Time', 'time', 'datetime', 'time_tag']
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
 
 DATA_SOURCES = [
     'market', 'planetary', 'geomagnetic', 'schumann', 'gcp'
 ]
+MAX_DOWNLOADS = 32  # concurrent S3 GETs
+
+# Raw objects are kept in /tmp between warm invocations and re-fetched only
+# when their ETag changes; least recently used files go once over the cap.
+# The function gets 2GB of /tmp (template.yaml), leaving room beyond the cap
+# for in-flight .part downloads and the spooled master Parquet
+CACHE_DIR = '/tmp/chimera-raw-cache'
+CACHE_MAX_BYTES = 400 * 1024 * 1024
+_cache_lock = threading.Lock()
+_cached_objects = OrderedDict()  # s3_key -> {'etag', 'path', 'size', 'encoding'}
+
+# The master dataset is written as Parquet; set WRITE_JSON_COPY=true to also
+# write latest_aligned.json for consumers that still expect JSON records
+LATEST_KEY = 'latest_aligned.parquet'
+LEGACY_JSON_KEY = 'latest_aligned.json'
+WRITE_JSON_COPY = os.environ.get('WRITE_JSON_COPY', 'false').lower() == 'true'
+
+# Multipart settings for the master dataset: parts upload in parallel above 8MB
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+SPOOL_MAX_BYTES = 16 * 1024 * 1024  # larger outputs spill to /tmp instead of RAM
+
+# Parquet key-value metadata entry describing the hourly index ({'start', 'periods', 'freq'});
+# readers rebuild it with pd.date_range instead of loading a timestamp column
+INDEX_METADATA_KEY = b'chimera_index'
+
+def get_latest_items(table, source: str) -> List[Dict]:
+    """
+    Query the by_source_type index for the latest metadata record of each
+    entity (e.g. planetary_Sun) of one source.
+    """
+    # Ingesters register their entity ids on a per-source item; once every
+    # registered entity has been seen there is no need to read further back
+    registry = table.get_item(
+        Key={'source_id': f'source_type#{source}', 'timestamp': 'entities'},
+        ProjectionExpression='entity_ids'
+    ).get('Item') or {}
+    expected = registry.get('entity_ids') or set()
+    
+    kwargs = {
+        'IndexName': SOURCE_TYPE_INDEX,
+        'KeyConditionExpression': Key('source_type').eq(source),
+        'ScanIndexForward': False,
+        'ProjectionExpression': 'source_id, s3_key, processed_key'
+    }
+    
+    # Items arrive newest first, so the first record seen for each source_id is its latest
+    latest_by_entity = {}
+    while True:
+        result = table.query(**kwargs)
+        for item in result.get('Items', []):
+            latest_by_entity.setdefault(item['source_id'], item)
+        
+        if 'LastEvaluatedKey' not in result or (expected and expected <= latest_by_entity.keys()):
+            break
+        kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+    
+    return list(latest_by_entity.values())
 
 def get_latest_s3_keys() -> Dict[str, List[Dict]]:
     """
@@ -49,35 +135,23 @@ def get_latest_s3_keys() -> Dict[str, List[Dict]]:
         return {}
     
     table = dynamodb.Table(METADATA_TABLE)
-    source_map = {}
     
-    for source in DATA_SOURCES:
-        # Scan for this source prefix
-        # Note: In prod, query via GSI would be better, but Scan is fine for low volume
-        response = table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr('source_id').begins_with(f"{source}_")
-        )
-        
-        items = response.get('Items', [])
-        latest_by_entity = {}
-        
-        for item in items:
-            entity = item['source_id'] # e.g. planetary_Sun
-            
-            # Simple "latest" check
-            if entity not in latest_by_entity:
-                latest_by_entity[entity] = item
-            else:
-                if item.get('ingestion_time', '') > latest_by_entity[entity].get('ingestion_time', ''):
-                    latest_by_entity[entity] = item
-        
+    # One index query per source, run concurrently
+    with ThreadPoolExecutor(max_workers=len(DATA_SOURCES)) as executor:
+        latest_by_source = dict(zip(
+            DATA_SOURCES,
+            executor.map(lambda source: get_latest_items(table, source), DATA_SOURCES)
+        ))
+    
+    source_map = {}
+    for source, items in latest_by_source.items():
         # Extract keys
         source_keys = []
-        for entity_id, item in latest_by_entity.items():
+        for item in items:
             key = item.get('s3_key') or item.get('processed_key')
             if key:
                 source_keys.append({
-                    'entity': entity_id, 
+                    'entity': item['source_id'], 
                     'key': key,
                     'type': source
                 })
@@ -86,48 +160,133 @@ def get_latest_s3_keys() -> Dict[str, List[Dict]]:
         
     return source_map
 
+def _evict_cached_objects() -> None:
+    """Drop least recently used cache files until the cache fits CACHE_MAX_BYTES. Caller holds _cache_lock."""
+    total = sum(entry['size'] for entry in _cached_objects.values())
+    while total > CACHE_MAX_BYTES and len(_cached_objects) > 1:
+        _, entry = _cached_objects.popitem(last=False)
+        total -= entry['size']
+        if all(other['path'] != entry['path'] for other in _cached_objects.values()):
+            try:
+                os.remove(entry['path'])
+            except FileNotFoundError:
+                pass
+
+def fetch_raw_object(s3_key: str) -> Dict:
+    """
+    Return the cache entry for a raw object, downloading it only if it changed.
+    
+    A cached object is revalidated with a conditional GET (If-None-Match on
+    its ETag), so an unchanged file costs one empty 304 response instead of
+    its whole payload.
+    """
+    with _cache_lock:
+        entry = _cached_objects.get(s3_key)
+    
+    kwargs = {'Bucket': RAW_BUCKET, 'Key': s3_key}
+    if entry:
+        kwargs['IfNoneMatch'] = entry['etag']
+    
+    try:
+        obj = s3_client.get_object(**kwargs)
+    except ClientError as e:
+        if entry and e.response['Error']['Code'] in ('304', 'NotModified'):
+            with _cache_lock:
+                if s3_key in _cached_objects:
+                    _cached_objects.move_to_end(s3_key)
+            return entry
+        raise
+    
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, obj['ETag'].strip('"'))
+    
+    # Write under a per-thread name and rename, so readers never see a partial file
+    partial = f"{path}.{threading.get_ident()}.part"
+    with open(partial, 'wb') as f:
+        shutil.copyfileobj(obj['Body'], f, 1024 * 1024)
+    os.replace(partial, path)
+    
+    entry = {
+        'etag': obj['ETag'],
+        'path': path,
+        'size': obj['ContentLength'],
+        'encoding': obj.get('ContentEncoding'),
+    }
+    with _cache_lock:
+        _cached_objects.pop(s3_key, None)
+        _cached_objects[s3_key] = entry
+        _evict_cached_objects()
+    
+    return entry
+
 def load_data_frame(source_type: str, s3_key: str) -> pd.DataFrame:
     """Load data from S3 into a standardize DataFrame with 'timestamp' index."""
     try:
-        obj = s3_client.get_object(Bucket=RAW_BUCKET, Key=s3_key)
-        body = obj['Body'].read()
-        
-        df = pd.DataFrame()
+        cached = fetch_raw_object(s3_key)
+        try:
+            raw = open(cached['path'], 'rb')
+        except FileNotFoundError:
+            # Another thread evicted the file after it was revalidated: download it again
+            with _cache_lock:
+                if _cached_objects.get(s3_key) is cached:
+                    del _cached_objects[s3_key]
+            cached = fetch_raw_object(s3_key)
+            raw = open(cached['path'], 'rb')
         
-        # Detect format
-        if s3_key.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(body))
-        elif s3_key.endswith('.json'):
-            data = json.loads(body)
-            # Handle different JSON structures
-            if isinstance(data, list):
-                df = pd.DataFrame(data)
-            elif isinstance(data, dict):
-                # Check for wrapped formats like Horizons
-                if 'data' in data and isinstance(data['data'], list):
-                     df = pd.DataFrame(data['data'])
-                elif 'result' in data: 
-                    # Raw text response from Horizons, skipped for now or need parser
-                    # For now, return empty if not tabular
-                    return pd.DataFrame()
-                else:
-                    df = pd.DataFrame([data]) # Single object
+        with raw as body:
+            if cached['encoding'] == 'gzip':
+                # Decompress while reading rather than holding both copies in memory
+                body = gzip.GzipFile(fileobj=body)
+            
+            df = pd.DataFrame()
+            
+            # Detect format
+            # Arrow-backed dtypes: packed strings and nullable numbers take far less
+            # memory than NumPy object/float64 columns
+            if s3_key.endswith('.parquet'):
+                df = pd.read_parquet(body, dtype_backend='pyarrow')
+            elif s3_key.endswith('.csv'):
+                # Arrow's multithreaded parser reads the file block by block
+                table = pacsv.read_csv(body, read_options=pacsv.ReadOptions(use_threads=True))
+                df = table.to_pandas(types_mapper=pd.ArrowDtype)
+            elif s3_key.endswith('.json'):
+                data = orjson.loads(body.read())
+                # Handle different JSON structures
+                if isinstance(data, list):
+                    df = pd.DataFrame(data)
+                elif isinstance(data, dict):
+                    # Check for wrapped formats like Horizons
+                    if 'data' in data and isinstance(data['data'], list):
+                         df = pd.DataFrame(data['data'])
+                    elif 'result' in data: 
+                        # Raw text response from Horizons, skipped for now or need parser
+                        # For now, return empty if not tabular
+                        return pd.DataFrame()
+                    else:
+                        df = pd.DataFrame([data]) # Single object
+                df = df.convert_dtypes(dtype_backend='pyarrow')
         
         if df.empty:
             return df
             
         # Standardize Timestamp Column
-        # List of potential timestamp column names
-        ts_cols = ['Date', 'date', 'timestamp', 'Time', 'time', 'datetime', 'time_tag']
-        ts_col = next((c for c in ts_cols if c in df.columns), None)
+        ts_col = next((c for c in TIMESTAMP_COLUMNS if c in df.columns), None)
         
         if ts_col:
-            df['timestamp'] = pd.to_datetime(df[ts_col], utc=True, errors='coerce')
+            # ISO-8601 strings (NOAA time_tag, exported dates) parse on pandas' C fast
+            # path when the format is given, instead of per-element inference
+            values = df[ts_col].dropna()
+            sample = values.iloc[0] if len(values) else None
+            fmt = 'ISO8601' if isinstance(sample, str) and ISO_DATE_RE.match(sample) else None
+            
+            df['timestamp'] = pd.to_datetime(df[ts_col], utc=True, errors='coerce', format=fmt, cache=True)
             df = df.dropna(subset=['timestamp'])
             df = df.set_index('timestamp')
-            df = df.sort_index()
-            # Remove duplicate indices
-            df = df[~df.index.duplicated(keep='last')]
+            if not df.index.is_monotonic_increasing:
+                df = df.sort_index()
+            # Remove duplicate indices (most sources have none, and the check is cheap on a sorted index)
+            if not df.index.is_unique:
+                df = df[~df.index.duplicated(keep='last')]
         else:
             logger.warning(f"No timestamp column found in {s3_key}")
             return pd.DataFrame()
@@ -138,6 +297,72 @@ def load_data_frame(source_type: str, s3_key: str) -> pd.DataFrame:
         logger.error(f"Error loading {s3_key}: {e}")
         return pd.DataFrame()
 
+def align_entity(df: pd.DataFrame, source: str, entity_name: str,
+                 master_idx: pd.DatetimeIndex, master_frame: pd.DataFrame) -> pd.DataFrame:
+    """Resample one entity's numeric columns onto the master hourly index, with prefixed column names."""
+    # Select meaningful columns
+    # For Market: Close, Volume
+    # For Planetary: (This needs complex parsing of text, skipped for MVP)
+    # For Schumann: Frequency, Power
+    
+    prefix = entity_name.replace(f"{source}_", "")
+    
+    # Select numeric columns only
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) == 0:
+        return pd.DataFrame()
+    df_num = df.loc[:, numeric_cols]
+
+    # Resample to hourly
+    # Market: ffill (last known price)
+    # Others: mean (average over the hour) or ffill
+    
+    if source == 'market':
+        # Market data is usually daily. We simply ffill for the whole day.
+        # Rationale: The "state" of the market is the last Close price until open.
+        # Each master hour takes the latest row at or before it: one binary search per
+        # hour and a row gather, with no intermediate hourly frame
+        positions = df_num.index.searchsorted(master_idx, side='right') - 1
+        found = positions >= 0
+        values = np.full((len(master_idx), len(numeric_cols)), np.nan, dtype=np.float32)
+        values[found] = df_num.to_numpy(dtype=np.float32, na_value=np.nan)[positions[found]]
+        hourly = pd.DataFrame(values, index=master_idx, columns=numeric_cols)
+    else:
+        # Others might be higher freq (Schumann) or lower.
+        # Resample only the span that can land on the master index: resample
+        # allocates a bin for every hour between the first and last timestamp,
+        # so one stray far-off timestamp would otherwise mean millions of bins
+        window = df_num.loc[master_idx[0] - pd.Timedelta('1h'):master_idx[-1] + pd.Timedelta('2h')]
+        hourly = window.resample('1h').mean().reset_index()
+        hourly['timestamp'] = hourly['timestamp'].dt.as_unit(master_idx.unit)
+        # One sorted merge onto the master hours; the tolerance keeps far gaps unfilled
+        hourly = pd.merge_asof(
+            master_frame, hourly, on='timestamp',
+            direction='nearest', tolerance=pd.Timedelta('1h')
+        ).set_index('timestamp')
+    
+    # Rename columns (vectorized on the column Index)
+    hourly = hourly.add_prefix(f"{source}_{prefix}_")
+    hourly.columns = hourly.columns.str.lower().str.replace(' ', '_', regex=False)
+    
+    return hourly
+
+def load_and_align(source: str, item: Dict, master_idx: pd.DatetimeIndex,
+                   master_frame: pd.DataFrame):
+    """Download one entity's file and align it; None if there is nothing usable."""
+    df = load_data_frame(source, item['key'])
+    if df.empty:
+        return None
+    
+    entity_name = item['entity'] # e.g. planetary_Mars
+    try:
+        hourly = align_entity(df, source, entity_name, master_idx, master_frame)
+    except Exception as e:
+        logger.warning(f"Failed to align {entity_name}: {e}")
+        return None
+    
+    return None if hourly.empty else hourly
+
 def process_alignment() -> Dict:
     """Main execution logic."""
     logger.info("Starting Temporal Alignment...")
@@ -151,85 +376,97 @@ def process_alignment() -> Dict:
     start_date = end_date - timedelta(days=30)
     
     master_idx = pd.date_range(start=start_date, end=end_date, freq='1h', name='timestamp', tz='UTC')
-    master_df = pd.DataFrame(index=master_idx)
+    master_frame = pd.DataFrame({'timestamp': master_idx})  # merge_asof target
     
     stats = {'sources': 0, 'columns': 0}
+    aligned_frames = []
     
     # 2. Process each source and merge
     for source, items in source_map.items():
         logger.info(f"Processing source: {source} ({len(items)} files)")
+    
+    # Downloads are I/O bound and resampling runs largely in pandas' C code, so each
+    # entity is fetched and aligned on the pool; results are collected in a fixed
+    # order so the output column order doesn't depend on download timing
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS) as executor:
+        futures = [
+            executor.submit(load_and_align, source, item, master_idx, master_frame)
+            for source, items in source_map.items()
+            for item in items
+        ]
         
-        for item in items:
-            df = load_data_frame(source, item['key'])
-            if df.empty:
+        for future in futures:
+            hourly = future.result()
+            if hourly is None:
                 continue
-                
-            entity_name = item['entity'] # e.g. planetary_Mars
-            
-            # Select meaningful columns
-            # For Market: Close, Volume
-            # For Planetary: (This needs complex parsing of text, skipped for MVP)
-            # For Schumann: Frequency, Power
-            
-            prefix = entity_name.replace(f"{source}_", "")
-            
-            # Resample strategy
-            resampled = pd.DataFrame()
             
-            try:
-                # Select numeric columns only
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                if len(numeric_cols) == 0:
-                    continue
-
-                # Resample to hourly
-                # Market: ffill (last known price)
-                # Others: mean (average over the hour) or ffill
-                
-                if source == 'market':
-                    # Market data is usually daily. We simply ffill for the whole day.
-                    # Rationale: The "state" of the market is the last Close price until open.
-                    hourly = df[numeric_cols].resample('1h').ffill().reindex(master_idx, method='ffill')
-                else:
-                    # Others might be higher freq (Schumann) or lower
-                    hourly = df[numeric_cols].resample('1h').mean()
-                    hourly = hourly.reindex(master_idx, method='nearest', limit=1) # Don't fill too far gaps
-                
-                # Rename columns
-                hourly.columns = [f"{source}_{prefix}_{c}".lower().replace(' ', '_') for c in hourly.columns]
-                
-                # Merge
-                master_df = master_df.join(hourly)
-                stats['sources'] += 1
-                stats['columns'] += len(hourly.columns)
-                
-            except Exception as e:
-                logger.warning(f"Failed to align {entity_name}: {e}")
-                continue
+            # Copied into the preallocated master block below; a join per entity re-copies the growing frame
+            aligned_frames.append(hourly)
+            stats['sources'] += 1
+            stats['columns'] += len(hourly.columns)
 
+    # Every frame is already aligned to master_idx, so each one is copied into its column
+    # slice of a single float32 block: one allocation, half the memory of float64, and
+    # ample precision for these series
+    values = np.empty((len(master_idx), stats['columns']), dtype=np.float32)
+    columns = []
+    offset = 0
+    for frame in aligned_frames:
+        width = frame.shape[1]
+        values[:, offset:offset + width] = frame.to_numpy(dtype=np.float32, na_value=np.nan)
+        columns.extend(frame.columns)
+        offset += width
+    
+    master_df = pd.DataFrame(values, index=master_idx, columns=columns, copy=False)
+    
     # 3. Save Master Dataset
     logger.info(f"Alignment Complete. Shape: {master_df.shape}")
     
-    # Save as JSON (orientation='split' preserves index) or CSV
-    output_key = f"master_aligned_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    # Save as Parquet: columnar, typed and compressed; reloads without re-parsing text
+    output_key = f"master_aligned_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.parquet"
     
-    json_buffer = master_df.reset_index().to_json(orient='records', date_format='iso')
+    # The hourly index is fully described by its start, length and frequency
+    table = pa.Table.from_pandas(master_df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        INDEX_METADATA_KEY: orjson.dumps({
+            'start': master_idx[0].isoformat(),
+            'periods': len(master_idx),
+            'freq': '1h',
+        }),
+    })
     
-    s3_client.put_object(
-        Bucket=PROCESSED_BUCKET,
-        Key=output_key,
-        Body=json_buffer,
-        ContentType='application/json'
-    )
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as f:
+        pq.write_table(table, f, compression='snappy')
+        f.seek(0)
+        s3_client.upload_fileobj(
+            f,
+            PROCESSED_BUCKET,
+            output_key,
+            ExtraArgs={'ContentType': 'application/vnd.apache.parquet'},
+            Config=TRANSFER_CONFIG,
+        )
     
-    # Also save a 'latest' copy
-    s3_client.put_object(
+    # Also save a 'latest' copy, tagged with the key it mirrors (read by the dashboard).
+    # A server-side copy, so the payload is not uploaded a second time
+    s3_client.copy_object(
         Bucket=PROCESSED_BUCKET,
-        Key='latest_aligned.json',
-        Body=json_buffer,
-        ContentType='application/json'
+        Key=LATEST_KEY,
+        CopySource={'Bucket': PROCESSED_BUCKET, 'Key': output_key},
+        ContentType='application/vnd.apache.parquet',
+        Metadata={'source_key': output_key},
+        MetadataDirective='REPLACE'
     )
     
+    if WRITE_JSON_COPY:
+        s3_client.put_object(
+            Bucket=PROCESSED_BUCKET,
+            Key=LEGACY_JSON_KEY,
+            Body=master_df.reset_index().to_json(orient='records', date_format='iso'),
+            ContentType='application/json',
+            Metadata={'source_key': output_key}
+        )
+    
     return {
         'status': 'success',
         'key': output_key,
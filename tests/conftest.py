@@ -0,0 +1,13 @@
+"""
+Shared pytest setup.
+
+The handlers are deployed as top-level modules (CodeUri: src/handlers/), so
+tests import them the same way. Module-level boto3 clients need a region but
+make no calls at import time.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'handlers'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
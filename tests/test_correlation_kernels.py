@@ -0,0 +1,132 @@
+"""Correlation kernels in analyze_correlations, checked against pandas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyze_correlations as ac
+
+N = 720
+MAX_LAG = 24
+
+
+def _reference_lagged(a: np.ndarray, b: np.ndarray, lag: int) -> float:
+    """pandas' answer for a[:, 0] against b[:, 0] shifted back by `lag` rows."""
+    return pd.Series(a[:, 0], dtype=float).corr(
+        pd.Series(b[:, 0], dtype=float).shift(lag), min_periods=ac.MIN_PERIODS
+    )
+
+
+def _constant_overlap_pair():
+    """
+    Two series that vary elsewhere but are constant wherever they overlap
+    at every lag 1..MAX_LAG, so their centered values are nonzero constants.
+    """
+    a = np.full((N, 1), np.nan, dtype=np.float32)
+    a[80:120, 0] = np.random.default_rng(0).normal(100, 5, 40)
+    a[300:, 0] = 101.37
+    b = np.full((N, 1), np.nan, dtype=np.float32)
+    b[:50, 0] = np.random.default_rng(1).normal(0, 1, 50)
+    b[300:, 0] = 3.25
+    return a, b
+
+
+def test_lagged_constant_overlap_is_nan():
+    a, b = _constant_overlap_pair()
+    r, n = ac._lagged_pearson(a, b, MAX_LAG)
+
+    assert (n[:, 0, 0] >= ac.MIN_PERIODS).all()
+    assert np.isnan(r).all()
+    assert len(ac._significant(r)) == 0
+
+
+def test_instant_constant_overlap_is_nan():
+    a, b = _constant_overlap_pair()
+    b[50:300, 0] = np.nan
+    b[150:200, 0] = np.random.default_rng(2).normal(size=50)
+    r, _ = ac._pearson_matrix(a, b)
+
+    assert np.isnan(r).all()
+
+
+def test_lagged_low_variance_pair_is_kept():
+    rng = np.random.default_rng(3)
+    a = rng.normal(size=(N, 1)).astype(np.float32)
+    b = (250 + 1e-3 * rng.normal(size=(N, 1))).astype(np.float32)
+    r, _ = ac._lagged_pearson(a, b, MAX_LAG)
+
+    expected = [_reference_lagged(a, b, lag) for lag in range(1, MAX_LAG + 1)]
+    np.testing.assert_allclose(r[:, 0, 0], expected, rtol=0, atol=1e-9)
+
+
+def _gappy_blocks(seed: int):
+    """Market/other blocks with scattered NaN gaps and mixed scales."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(100, 5, (N, 3)).astype(np.float32)
+    other = (rng.normal(size=(N, 4)) * [1, 1e-2, 50, 3] + [0, 7, -300, 20]).astype(np.float32)
+    market[rng.random(market.shape) < 0.4] = np.nan
+    other[rng.random(other.shape) < 0.2] = np.nan
+    return market, other
+
+
+def test_pearson_matrix_matches_pandas():
+    market, other = _gappy_blocks(4)
+    r, n = ac._pearson_matrix(market, other)
+
+    a = pd.DataFrame(market, dtype=float)
+    b = pd.DataFrame(other, dtype=float)
+    for i in a.columns:
+        for j in b.columns:
+            assert r[i, j] == pytest.approx(a[i].corr(b[j], min_periods=ac.MIN_PERIODS), abs=1e-9)
+            assert n[i, j] == (a[i].notna() & b[j].notna()).sum()
+
+
+def test_lagged_pearson_matches_pandas_shift():
+    market, other = _gappy_blocks(5)
+    r, n = ac._lagged_pearson(market, other, MAX_LAG)
+
+    a = pd.DataFrame(market, dtype=float)
+    b = pd.DataFrame(other, dtype=float)
+    for lag in (1, 2, 7, MAX_LAG):
+        for i in a.columns:
+            for j in b.columns:
+                shifted = b[j].shift(lag)
+                expected = a[i].corr(shifted, min_periods=ac.MIN_PERIODS)
+                assert r[lag - 1, i, j] == pytest.approx(expected, abs=1e-9)
+                assert n[lag - 1, i, j] == (a[i].notna() & shifted.notna()).sum()
+
+
+def test_overlap_below_min_periods_is_nan():
+    rng = np.random.default_rng(6)
+    a = rng.normal(size=(N, 1)).astype(np.float32)
+    b = np.full((N, 1), np.nan, dtype=np.float32)
+    b[100:100 + ac.MIN_PERIODS - 1, 0] = rng.normal(size=ac.MIN_PERIODS - 1)
+
+    r, n = ac._pearson_matrix(a, b)
+    assert n[0, 0] == ac.MIN_PERIODS - 1
+    assert np.isnan(r[0, 0])
+
+    r, _ = ac._lagged_pearson(a, b, MAX_LAG)
+    assert np.isnan(r).all()
+
+
+def test_constant_column_is_nan():
+    market, other = _gappy_blocks(7)
+    other[:, 1] = np.where(np.isnan(other[:, 1]), np.nan, 42.0)
+
+    r, _ = ac._pearson_matrix(market, other)
+    assert np.isnan(r[:, 1]).all()
+    assert np.isfinite(r[:, [0, 2, 3]]).all()
+
+    r, _ = ac._lagged_pearson(market, other, MAX_LAG)
+    assert np.isnan(r[:, :, 1]).all()
+    assert np.isfinite(r[:, :, [0, 2, 3]]).all()
+
+
+def test_lag_records_carry_one_based_lags():
+    market, other = _gappy_blocks(8)
+    other[:-MAX_LAG, 0] = market[MAX_LAG:, 1]  # other leads market column 1 by MAX_LAG hours
+
+    rec = ac.compute_lag_correlations(market, other, ['m0', 'm1', 'm2'], list('wxyz'), MAX_LAG)
+    best = rec[np.argmax(np.abs(rec['r']))]
+    assert (best['market'], best['other'], best['lag'], best['r']) == (1, 0, MAX_LAG, 1.0)